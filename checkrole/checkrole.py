@@ -1,9 +1,28 @@
+import asyncio
+import contextlib
+import csv
+import io
 import os
+from typing import Literal, Union
+
 import discord
-from discord.ext import commands
-from pymongo import MongoClient
+from discord.ext import commands, tasks
+from pymongo.errors import PyMongoError
 from core import checks
-from core.models import PermissionLevel
+from core.models import PermissionLevel, getLogger
+from core.paginator import EmbedPaginatorSession
+
+logger = getLogger(__name__)
+
+# How often the role cache is re-read to pick up edits made outside the bot
+ROLE_CACHE_REFRESH_MINUTES = 30
+
+# Members checked per pass of an audit before yielding to the event loop
+AUDIT_BATCH_SIZE = 1000
+# Members listed per page of an audit report
+AUDIT_PAGE_SIZE = 20
+# Characters of field text per audit page, kept under Discord's 6000 per embed
+AUDIT_PAGE_CHARS = 5000
 
 
 class CheckRole(commands.Cog):
@@ -12,11 +31,105 @@ class CheckRole(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-        # Connect to MongoDB
-        mongo_uri = os.getenv("MONGO_URI")
-        self.mongo_client = MongoClient(mongo_uri)
-        self.db = self.mongo_client["modmail_bot"]
-        self.role_collection = self.db["roles"]
+        # Reuse the bot's Motor connection pool; its database is also "modmail_bot"
+        self.role_collection = self.bot.api.db["roles"]
+
+        # role_id -> role_name, kept in sync with the collection
+        self.roles = {}
+        self.roles_loaded = asyncio.Event()
+        self._warmup = None
+
+        guild_id = os.getenv("GUILD_ID")
+        self.guild_id = int(guild_id) if guild_id else None
+        self._guild = None
+
+        # thread_id -> in-flight history lookup, shared by concurrent events
+        self._creator_lookups = {}
+
+    def _timed(self, name):
+        """Times a block in ``bot.plugin_metrics`` while the PluginStats plugin is loaded."""
+        metrics = getattr(self.bot, "plugin_metrics", None)
+        if metrics is None:
+            return contextlib.nullcontext()
+        return metrics.timed(self, name)
+
+    async def cog_load(self):
+        # Done in the background so the other plugins can load meanwhile
+        self._warmup = asyncio.create_task(self.warm_up())
+
+    async def cog_unload(self):
+        if self._warmup is not None:
+            self._warmup.cancel()
+        self.refresh_roles.cancel()
+
+    async def warm_up(self):
+        """Ensure each role can only be registered once and warm the role cache."""
+        try:
+            await self.role_collection.create_index("role_id", unique=True)
+        except PyMongoError as e:
+            # Most likely duplicate entries from before the index existed
+            logger.warning("Could not create unique index on roles.role_id: %s", e)
+
+        try:
+            await self.load_roles()
+        except PyMongoError as e:
+            logger.warning("Failed to load the role cache, retrying on the next refresh: %s", e)
+        self.roles_loaded.set()
+        self.refresh_roles.start()
+
+    async def load_roles(self):
+        """Replace the role cache with the contents of the roles collection."""
+        with self._timed("mongo.load_roles"):
+            self.roles = {
+                role_data["role_id"]: role_data["role_name"]
+                async for role_data in self.role_collection.find()
+            }
+
+    @tasks.loop(minutes=ROLE_CACHE_REFRESH_MINUTES)
+    async def refresh_roles(self):
+        """Pick up roles added or removed directly in the database."""
+        try:
+            await self.load_roles()
+        except PyMongoError as e:
+            logger.warning("Failed to refresh the role cache: %s", e)
+
+    @refresh_roles.before_loop
+    async def before_refresh_roles(self):
+        # The cache was just loaded in cog_load
+        await asyncio.sleep(ROLE_CACHE_REFRESH_MINUTES * 60)
+
+    @property
+    def guild(self):
+        """The guild whose members are checked, resolved once from GUILD_ID."""
+        if self._guild is None and self.guild_id is not None:
+            self._guild = self.bot.get_guild(self.guild_id)
+        return self._guild
+
+    async def resolve_creator_id(self, thread: discord.Thread):
+        """Find who created a thread, only asking the API when the gateway data lacks it."""
+        if thread.owner_id:
+            return thread.owner_id
+
+        # Forum posts and threads started from a message share the starter message's id
+        if thread.starter_message is not None:
+            return thread.starter_message.author.id
+
+        lookup = self._creator_lookups.get(thread.id)
+        if lookup is None:
+            lookup = asyncio.create_task(self._fetch_creator_id(thread))
+            self._creator_lookups[thread.id] = lookup
+            lookup.add_done_callback(lambda _: self._creator_lookups.pop(thread.id, None))
+        return await lookup
+
+    async def _fetch_creator_id(self, thread: discord.Thread):
+        """Fall back to the author of the thread's first message."""
+        try:
+            with self._timed("discord.thread_history"):
+                async for message in thread.history(limit=1, oldest_first=True):
+                    return message.author.id
+        except discord.HTTPException as e:
+            logger.warning("Could not read the history of thread %s: %s", thread.id, e)
+        return None
 
     @checks.has_permissions(PermissionLevel.ADMIN)
     @commands.group(name="checkrole", invoke_without_command=True)
@@ -28,20 +141,28 @@ class CheckRole(commands.Cog):
     @checkrole.command(name="addrole")
     async def addrole(self, ctx, role: discord.Role):
         """Add a role to the role-check system."""
-        existing_role = self.role_collection.find_one({"role_id": role.id})
+        with self._timed("mongo.addrole"):
+            result = await self.role_collection.update_one(
+                {"role_id": role.id},
+                {"$setOnInsert": {"role_id": role.id, "role_name": role.name}},
+                upsert=True,
+            )
 
-        if existing_role:
+        if result.upserted_id is None:
+            self.roles.setdefault(role.id, role.name)
             await ctx.send(f"The role `{role.name}` is already in the system.")
             return
 
-        self.role_collection.insert_one({"role_id": role.id, "role_name": role.name})
+        self.roles[role.id] = role.name
         await ctx.send(f"Role `{role.name}` has been added to the role-check system.")
 
     @checks.has_permissions(PermissionLevel.ADMIN)
     @checkrole.command(name="removerole")
     async def removerole(self, ctx, role: discord.Role):
         """Remove a role from the role-check system."""
-        result = self.role_collection.delete_one({"role_id": role.id})
+        with self._timed("mongo.removerole"):
+            result = await self.role_collection.delete_one({"role_id": role.id})
+        self.roles.pop(role.id, None)
 
         if result.deleted_count == 0:
             await ctx.send(f"The role `{role.name}` is not in the system.")
@@ -49,32 +170,128 @@ class CheckRole(commands.Cog):
 
         await ctx.send(f"Role `{role.name}` has been removed from the role-check system.")
 
+    @checks.has_permissions(PermissionLevel.ADMIN)
+    @checkrole.command(name="audit")
+    async def audit(
+        self,
+        ctx,
+        scope: Union[discord.Role, Literal["tickets", "all"]] = "tickets",
+        output: Literal["report", "csv"] = "report",
+    ):
+        """
+        Check many members against the role-check system at once.
+
+        `scope` is `tickets` (recipients of open threads, the default), `all`
+        (every member) or a role (every member with that role). Use `csv` as
+        the second argument to get a CSV file of every checked member instead
+        of the report of members who are missing roles.
+        """
+        await self.roles_loaded.wait()
+        if not self.roles:
+            await ctx.send("There are no roles in the role-check system.")
+            return
+
+        guild = self.guild
+        if not guild:
+            await ctx.send("The configured guild could not be found.")
+            return
+
+        if not guild.chunked:
+            await guild.chunk()
+
+        if scope == "tickets":
+            members = [guild.get_member(thread.id) for thread in self.bot.threads.cache.values()]
+            members = [member for member in members if member is not None]
+            scope_name = "open tickets"
+        elif scope == "all":
+            members = guild.members
+            scope_name = "all members"
+        else:
+            members = scope.members
+            scope_name = f"members with `{scope.name}`"
+
+        roles = list(self.roles.items())
+        missing = []
+        csv_file = io.StringIO()
+        writer = csv.writer(csv_file)
+        writer.writerow(["member_id", "member_name", *(role_name for _, role_name in roles)])
+
+        # Work in batches and yield in between so large guilds don't stall the bot
+        for start in range(0, len(members), AUDIT_BATCH_SIZE):
+            for member in members[start : start + AUDIT_BATCH_SIZE]:
+                member_role_ids = {role.id for role in member.roles}
+                has_roles = [role_id in member_role_ids for role_id, _ in roles]
+                if output == "csv":
+                    writer.writerow([member.id, str(member), *("yes" if has else "no" for has in has_roles)])
+                elif not all(has_roles):
+                    missing.append(
+                        (member, [role_name for (_, role_name), has in zip(roles, has_roles) if not has])
+                    )
+            await asyncio.sleep(0)
+
+        if output == "csv":
+            await ctx.send(
+                f"Role audit of {len(members)} {scope_name}.",
+                file=discord.File(io.BytesIO(csv_file.getvalue().encode()), filename="role_audit.csv"),
+            )
+            return
+
+        summary = f"Checked {len(members)} {scope_name}, {len(missing)} missing at least one role."
+        if not missing:
+            await ctx.send(summary)
+            return
+
+        embeds = []
+        page_chars = 0
+        for member, missing_roles in missing:
+            name = f"{member} ({member.id})"
+            value = self._format_missing(missing_roles)
+            if (
+                not embeds
+                or len(embeds[-1].fields) >= AUDIT_PAGE_SIZE
+                or page_chars + len(name) + len(value) > AUDIT_PAGE_CHARS
+            ):
+                embeds.append(
+                    discord.Embed(
+                        title="Role Audit",
+                        description=summary,
+                        color=discord.Color.blue(),
+                    )
+                )
+                page_chars = 0
+            embeds[-1].add_field(name=name, value=value, inline=False)
+            page_chars += len(name) + len(value)
+
+        session = EmbedPaginatorSession(ctx, *embeds)
+        await session.run()
+
     @commands.Cog.listener()
     async def on_thread_create(self, thread: discord.Thread):
         """Triggered when a new thread is created."""
-        guild = self.bot.get_guild(int(os.getenv("GUILD_ID")))
+        with self._timed("listener.on_thread_create"):
+            await self.post_role_check(thread)
+
+    async def post_role_check(self, thread: discord.Thread):
+        """Post the creator's role statuses in a new thread."""
+        await self.roles_loaded.wait()
+        guild = self.guild
         if not guild:
             return
 
-        # Get the first message to determine the thread creator
-        async for message in thread.history(limit=1, oldest_first=True):
-            creator = message.author
+        creator_id = await self.resolve_creator_id(thread)
+        if creator_id is None:
+            return
 
         # Ensure the creator is a member of the guild
-        member = guild.get_member(creator.id)
+        member = guild.get_member(creator_id)
         if not member:
             return
 
-        # Retrieve roles from MongoDB
-        stored_roles = self.role_collection.find()
-        role_status = {}
-
-        # Check if the user has the required roles
-        for role_data in stored_roles:
-            role_id = role_data["role_id"]
-            role_name = role_data["role_name"]
-            has_role = discord.utils.get(member.roles, id=role_id) is not None
-            role_status[role_name] = has_role
+        # Check the member's roles against the cached role-check registry
+        member_role_ids = {role.id for role in member.roles}
+        role_status = {
+            role_name: role_id in member_role_ids for role_id, role_name in self.roles.items()
+        }
 
         # Build the embed to display role statuses
         embed = discord.Embed(
@@ -93,6 +310,13 @@ class CheckRole(commands.Cog):
         # Send the embed to the thread
         await thread.send(embed=embed)
 
+    @staticmethod
+    def _format_missing(role_names) -> str:
+        value = "❌ " + ", ".join(role_names)
+        if len(value) > 1024:
+            value = value[:1020].rsplit(", ", 1)[0] + ", …"
+        return value
+
 
 async def setup(bot):
     await bot.add_cog(CheckRole(bot))
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import json
+import os
+import time
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Literal, Optional
 
 import discord
 from discord.ext import commands
+from pymongo.errors import OperationFailure, PyMongoError
 
 from core import checks
 from core.models import PermissionLevel, getLogger
@@ -23,36 +28,339 @@ __description__ = "\n".join(__plugin_info__["description"])
 
 logger = getLogger(__name__)
 
+# Keys whose new value has to be pushed somewhere once it is in the cache. Everything
+# else (colors, prefix, permission levels, channel ids, ...) is read from the config on
+# every use, so updating the cache is all it takes.
+PRESENCE_KEYS = frozenset({"status", "activity_type", "activity_message"})
+
+# Background sync of external config edits
+SYNC_DEBOUNCE = 2.0  # Seconds without further writes before a burst of edits is applied
+SYNC_MAX_DELAY = 10.0  # Apply anyway after this many seconds of continuous writes
+SYNC_POLL_INTERVAL = 30  # Seconds between polls when change streams are unavailable
+SYNC_RETRY_DELAY = 30  # Seconds before reopening an interrupted change stream or retrying a read
+# Fields an external writer may stamp on the config document. When present, polling
+# only fetches these instead of the whole document.
+VERSION_FIELDS = ("version", "updated_at")
+
 
 class ConfigRefresh(commands.Cog, name=__plugin_name__):
     """Re-fetches the bot configuration from the database without a restart."""
 
     def __init__(self, bot: ModmailBot):
         self.bot: ModmailBot = bot
+        self.db = bot.api.get_plugin_partition(self)
+
+        # Keys the config document held when it was last read. Only those can have been
+        # removed from it; anything else in the cache came from config.json or the
+        # environment. None until the document has been read once.
+        self.stored_keys: Optional[set] = None
+
+        self.sync_enabled = True
+        self.sync_mode = "off"
+        self.syncs_applied = 0
+        self.last_sync = None
+        self._pending = asyncio.Event()
+        self._sync_tasks: list[asyncio.Task] = []
+
+    def _timed(self, name):
+        """Times a block in ``bot.plugin_metrics`` while the PluginStats plugin is loaded."""
+        metrics = getattr(self.bot, "plugin_metrics", None)
+        if metrics is None:
+            return contextlib.nullcontext()
+        return metrics.timed(self, name)
+
+    async def cog_load(self):
+        # Reading the setting is a database round trip; don't hold up the other plugins' loading
+        self._sync_tasks = [asyncio.create_task(self._start_sync_from_settings())]
+
+    async def _start_sync_from_settings(self) -> None:
+        while True:
+            try:
+                self.stored_keys = set(self.bot.config.filter_valid(await self.bot.api.get_config()))
+                settings = await self.db.find_one({"_id": "sync"}) or {}
+                break
+            except PyMongoError as e:
+                logger.warning(
+                    "Could not read the config sync settings (%s), retrying in %ss.", e, SYNC_RETRY_DELAY
+                )
+                await asyncio.sleep(SYNC_RETRY_DELAY)
+        self.sync_enabled = settings.get("enabled", True)
+        self._sync_tasks = []
+        if self.sync_enabled:
+            self.start_sync()
+
+    async def cog_unload(self):
+        self.stop_sync()
+
+    def start_sync(self) -> None:
+        """Starts watching the config document for external edits."""
+        if self._sync_tasks:
+            return
+        self.sync_mode = "starting"
+        self._sync_tasks = [
+            asyncio.create_task(self._watch_config()),
+            asyncio.create_task(self._apply_pending()),
+        ]
+
+    def stop_sync(self) -> None:
+        for task in self._sync_tasks:
+            task.cancel()
+        self._sync_tasks = []
+        self._pending.clear()
+        self.sync_mode = "off"
+
+    async def _watch_config(self) -> None:
+        """Flags the config as pending whenever its document changes in the database."""
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                config_id = (await self.bot.api.get_config())["_id"]
+                break
+            except PyMongoError as e:
+                logger.warning(
+                    "Could not read the config document (%s), retrying in %ss.", e, SYNC_RETRY_DELAY
+                )
+                await asyncio.sleep(SYNC_RETRY_DELAY)
+        collection = self.bot.api.db.config
+        try:
+            await self._watch_stream(collection, config_id)
+        except OperationFailure as e:
+            # Standalone mongod and some hosted tiers don't support change streams
+            logger.info("Config change streams unavailable (%s), polling every %ss.", e, SYNC_POLL_INTERVAL)
+        except Exception:
+            # Drivers and mocks without change stream support fail in other ways; polling still works
+            logger.error(
+                "Config change stream failed, polling every %ss instead.", SYNC_POLL_INTERVAL, exc_info=True
+            )
+        await self._poll_config(collection, config_id)
+
+    async def _watch_stream(self, collection, config_id) -> None:
+        """
+        Follows a change stream on the config document. Raises OperationFailure if the
+        deployment can't open one at all, so the caller can fall back to polling.
+        """
+        pipeline = [{"$match": {"documentKey._id": config_id}}]
+        resume_token = None
+        opened = False
+        while True:
+            try:
+                async with collection.watch(pipeline, resume_after=resume_token) as stream:
+                    opened = True
+                    self.sync_mode = "change stream"
+                    async for _ in stream:
+                        resume_token = stream.resume_token
+                        self._pending.set()
+            except PyMongoError as e:
+                if not opened and isinstance(e, OperationFailure):
+                    raise
+                if isinstance(e, OperationFailure):
+                    # Most likely the resume token fell off the oplog; start a fresh stream
+                    resume_token = None
+                logger.warning("Config change stream interrupted (%s), reopening in %ss.", e, SYNC_RETRY_DELAY)
+            await asyncio.sleep(SYNC_RETRY_DELAY)
+            # Catch up on anything written while the stream was down
+            self._pending.set()
+
+    async def _poll_config(self, collection, config_id) -> None:
+        """Compares the config document's version stamp, or the whole document, every poll."""
+        self.sync_mode = "polling"
+        projection = {field: 1 for field in VERSION_FIELDS}
+        stamped = None
+        last = None
+        while True:
+            try:
+                if stamped is None:
+                    document = await collection.find_one({"_id": config_id}) or {}
+                    stamped = any(field in document for field in VERSION_FIELDS)
+                if stamped:
+                    document = await collection.find_one({"_id": config_id}, projection) or {}
+                    current = tuple(document.get(field) for field in VERSION_FIELDS)
+                else:
+                    current = await collection.find_one({"_id": config_id})
+                if last is not None and current != last:
+                    self._pending.set()
+                last = current
+            except PyMongoError as e:
+                logger.warning("Could not poll the config document: %s", e)
+            await asyncio.sleep(SYNC_POLL_INTERVAL)
+
+    async def _apply_pending(self) -> None:
+        """Applies flagged config edits once the writes have settled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._pending.wait()
+            deadline = loop.time() + SYNC_MAX_DELAY
+            while self._pending.is_set() and loop.time() < deadline:
+                self._pending.clear()
+                await asyncio.sleep(SYNC_DEBOUNCE)
+
+            try:
+                added, changed, removed = self.diff_config(await self.fetch_config())
+                if not (added or changed or removed):
+                    continue
+                with self._timed("sync.apply"):
+                    await self.apply_config_diff(added, changed, removed)
+            except Exception:
+                logger.error("Failed to sync the config from the database.", exc_info=True)
+                continue
+
+            self.syncs_applied += 1
+            self.last_sync = discord.utils.utcnow()
+            logger.info(
+                "Config synced from database: added %s, changed %s, removed %s.",
+                sorted(added), sorted(changed), sorted(removed),
+            )
+
+    def diff_config(self, stored: dict) -> tuple[dict, dict, list[str]]:
+        """
+        Compares a config document from the database against the in-memory cache.
+
+        Returns the keys to add and to change (mapped to their stored values) and the keys
+        to revert to their default. Only keys the database can hold are considered. A key
+        is only reverted if the previously read document held it, so values that came from
+        config.json or the environment stay. ``stored`` becomes the new previous document.
+        """
+        config = self.bot.config
+        stored = config.filter_valid(stored)
+        cache = dict(config.items())
+        previous_keys, self.stored_keys = self.stored_keys, set(stored)
 
-    @commands.command(name="configrefresh", aliases=["reloadconfig"])
+        added, changed, removed = {}, {}, []
+        for key, value in stored.items():
+            current = cache.get(key, config.defaults[key])
+            if current == value:
+                continue
+            if current == config.defaults[key]:
+                added[key] = value
+            else:
+                changed[key] = value
+
+        for key in sorted(previous_keys or ()):
+            if key in stored or cache.get(key, config.defaults[key]) == config.defaults[key]:
+                continue
+            if key.upper() in os.environ:
+                continue
+            removed.append(key)
+
+        return added, changed, removed
+
+    async def fetch_config(self) -> dict:
+        with self._timed("mongo.get_config"):
+            return await self.bot.api.get_config()
+
+    async def apply_config_diff(self, added: dict, changed: dict, removed: list[str]) -> None:
+        """Writes a diff from :meth:`diff_config` into the cache and runs the hooks it needs."""
+        config = self.bot.config
+        for key, value in {**added, **changed}.items():
+            config[key] = value
+        for key in removed:
+            config.remove(key)
+
+        touched = set(added) | set(changed) | set(removed)
+        if touched & PRESENCE_KEYS:
+            utility = self.bot.get_cog("Utility")
+            if utility is not None:
+                await utility.set_presence()
+
+    @commands.group(name="configrefresh", aliases=["reloadconfig"], invoke_without_command=True)
     @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
-    async def config_refresh(self, ctx: commands.Context):
+    async def config_refresh(self, ctx: commands.Context, mode: Literal["diff", "full"] = "diff"):
         """
         Re-fetches the bot configuration from the database.
 
-        Overwrites the in-memory config cache with the latest values stored in MongoDB.
+        By default only the keys that differ from the in-memory config cache are applied,
+        and the added, changed and removed keys are listed. Use `full` to overwrite the
+        whole cache with the stored config instead.
         Useful when the database has been edited externally and you want the changes
-        to take effect without restarting the bot.
+        to take effect without restarting the bot. See `configrefresh sync` to have this
+        happen automatically.
+
+        Requires permission level: **Administrator (4)**.
+        """
+        started = time.perf_counter()
+        if mode == "full":
+            await self.bot.config.refresh()
+            elapsed = time.perf_counter() - started
+            logger.info("Config manually refreshed by %s (%s) in %.0fms.", ctx.author, ctx.author.id, elapsed * 1000)
+
+            embed = discord.Embed(
+                title="Config Refreshed",
+                color=self.bot.main_color,
+                description="Successfully re-fetched the configuration from the database.",
+            )
+            embed.set_footer(
+                text=f"Requested by {ctx.author} • {elapsed * 1000:.0f} ms",
+                icon_url=ctx.author.display_avatar.url,
+            )
+            return await ctx.send(embed=embed)
+
+        stored = await self.fetch_config()
+        fetched = time.perf_counter()
+        added, changed, removed = self.diff_config(stored)
+        await self.apply_config_diff(added, changed, removed)
+        applied = time.perf_counter()
+
+        fetch_ms, apply_ms = (fetched - started) * 1000, (applied - fetched) * 1000
+        logger.info(
+            "Config manually refreshed by %s (%s): %d added, %d changed, %d removed (fetch %.0fms, apply %.0fms).",
+            ctx.author, ctx.author.id, len(added), len(changed), len(removed), fetch_ms, apply_ms,
+        )
+
+        embed = discord.Embed(title="Config Refreshed", color=self.bot.main_color)
+        if not (added or changed or removed):
+            embed.description = "The configuration is already up to date with the database."
+        else:
+            embed.description = "Applied the changes found in the database."
+            for name, keys in (("Added", added), ("Changed", changed), ("Removed", removed)):
+                if keys:
+                    embed.add_field(name=name, value=self._format_keys(keys), inline=False)
+        embed.set_footer(
+            text=f"Requested by {ctx.author} • fetch {fetch_ms:.0f} ms, apply {apply_ms:.0f} ms",
+            icon_url=ctx.author.display_avatar.url,
+        )
+        return await ctx.send(embed=embed)
+
+    @config_refresh.command(name="sync")
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def config_refresh_sync(self, ctx: commands.Context, enabled: Optional[bool] = None):
+        """
+        Shows or toggles the automatic config sync.
+
+        While on, external edits to the config document are picked up through a MongoDB
+        change stream (or by polling when the deployment doesn't support them) and applied
+        the same way as `configrefresh`. Use `on` or `off` to toggle it; the setting persists.
 
         Requires permission level: **Administrator (4)**.
         """
-        await self.bot.config.refresh()
-        logger.info("Config manually refreshed by %s (%s).", ctx.author, ctx.author.id)
+        if enabled is not None:
+            await self.db.update_one({"_id": "sync"}, {"$set": {"enabled": enabled}}, upsert=True)
+            self.sync_enabled = enabled
+            # Also cancels reading the stored setting if the plugin has only just loaded
+            self.stop_sync()
+            if enabled:
+                self.start_sync()
+            logger.info("Config sync turned %s by %s (%s).", "on" if enabled else "off", ctx.author, ctx.author.id)
 
         embed = discord.Embed(
-            title="Config Refreshed",
-            color=self.bot.main_color,
-            description="Successfully re-fetched the configuration from the database.",
+            title="Config Sync",
+            color=self.bot.main_color if self.sync_enabled else self.bot.error_color,
         )
-        embed.set_footer(text=f"Requested by {ctx.author}", icon_url=ctx.author.display_avatar.url)
+        embed.add_field(name="Status", value="On" if self.sync_enabled else "Off")
+        embed.add_field(name="Mode", value=self.sync_mode.capitalize())
+        embed.add_field(
+            name="Last Applied",
+            value=discord.utils.format_dt(self.last_sync, "R") if self.last_sync else "Never",
+        )
+        embed.add_field(name="Syncs Applied", value=str(self.syncs_applied))
         return await ctx.send(embed=embed)
 
+    @staticmethod
+    def _format_keys(keys) -> str:
+        value = ", ".join(f"`{key}`" for key in sorted(keys))
+        if len(value) > 1024:
+            value = value[:1020].rsplit(", ", 1)[0] + ", …"
+        return value
+
 
 async def setup(bot: ModmailBot):
     await bot.add_cog(ConfigRefresh(bot))
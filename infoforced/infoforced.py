@@ -1,22 +1,71 @@
+import asyncio
+import collections
+import copy
+import math
+import time
+
 import discord
-from discord.ext import commands
-from core import checks, utils
+from discord.ext import commands, tasks
+from core import checks
 from core.models import PermissionLevel, getLogger
 
 logger = getLogger(__name__)
 
+# Repeat invocations in the same channel within this many seconds get a short pointer to
+# the previous reply, which is still on screen, instead of a new embed.
+ABOUT_REPLY_WINDOW = 15
+
+# Rolling latency statistics for `about latency`
+LATENCY_WINDOW_MINUTES = 60
+HEARTBEAT_SAMPLE_SECONDS = 30
+HEARTBEAT_SAMPLES = LATENCY_WINDOW_MINUTES * 60 // HEARTBEAT_SAMPLE_SECONDS
+REST_SAMPLES = 500
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    return values[max(math.ceil(pct / 100 * len(values)) - 1, 0)]
+
 
 class Foo(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self._static_embed = None
+        # channel id -> (monotonic time, future of the message) of the last about reply;
+        # the future is stored before sending so a burst of invocations shares one reply
+        self._last_reply = {}
+        # (monotonic time, milliseconds) ring buffers
+        self.heartbeat_latencies = collections.deque(maxlen=HEARTBEAT_SAMPLES)
+        self.rest_latencies = collections.deque(maxlen=REST_SAMPLES)
 
-    @commands.command(aliases=["info"])
-    @checks.has_permissions(PermissionLevel.REGULAR)
-    @utils.trigger_typing
-    async def about(self, ctx):
-        """Shows information about this bot."""
-        embed = discord.Embed(color=self.bot.main_color, timestamp=discord.utils.utcnow())
+    async def cog_load(self):
+        if self.bot.user is not None:
+            self._static_embed = self.build_static_embed()
+        self.sample_heartbeat.start()
+
+    async def cog_unload(self):
+        self.sample_heartbeat.cancel()
+
+    @tasks.loop(seconds=HEARTBEAT_SAMPLE_SECONDS)
+    async def sample_heartbeat(self):
+        latency = self.bot.latency
+        if math.isfinite(latency):  # inf/nan until the first heartbeat is acknowledged
+            self.heartbeat_latencies.append((time.monotonic(), latency * 1000))
+
+    async def timed_send(self, ctx, **kwargs):
+        """Sends a reply and records how long the REST call took."""
+        started = time.perf_counter()
+        message = await ctx.send(**kwargs)
+        self.rest_latencies.append((time.monotonic(), (time.perf_counter() - started) * 1000))
+        return message
+
+    def build_static_embed(self):
+        """
+        Builds everything in the about embed that doesn't change while the bot runs,
+        as a dict: Embed.copy() shares its fields with the original.
+        """
+        embed = discord.Embed(color=self.bot.main_color)
         embed.set_author(
             name="Modmail - Information",
             icon_url=self.bot.user.display_avatar.url,
@@ -27,8 +76,9 @@ class Foo(commands.Cog):
         desc += "members to easily receive support by administartors. "
         embed.description = desc
 
-        embed.add_field(name="Uptime", value=self.bot.uptime)
-        embed.add_field(name="Latency", value=f"{self.bot.latency * 1000:.2f} ms")
+        # Uptime and latency are filled in per call
+        embed.add_field(name="Uptime", value="\u200b")
+        embed.add_field(name="Latency", value="\u200b")
         embed.add_field(name="Version", value=f"`{self.bot.version}`")
         embed.add_field(name="Authors", value="`kyb3r`, `Taki`, `fourjr`")
         embed.add_field(name="Hosting Method", value="`WANTUH`")
@@ -52,7 +102,84 @@ class Foo(commands.Cog):
 
         footer = "Wantuh's Hosting Service"
         embed.set_footer(text=footer)
-        await ctx.send(embed=embed)
+        return embed.to_dict()
+
+    @commands.group(aliases=["info"], invoke_without_command=True)
+    @checks.has_permissions(PermissionLevel.REGULAR)
+    async def about(self, ctx):
+        """Shows information about this bot."""
+        channel_id = ctx.channel.id
+        last = self._last_reply.get(channel_id)
+        if last is not None and (not last[1].done() or time.monotonic() - last[0] < ABOUT_REPLY_WINDOW):
+            # Resolves to None if that reply failed to send, in which case stay quiet
+            message = await asyncio.shield(last[1])
+            if message is not None:
+                await ctx.send(f"The bot information was just posted here: {message.jump_url}")
+            return
+
+        pending = asyncio.get_running_loop().create_future()
+        self._last_reply[channel_id] = (time.monotonic(), pending)
+        try:
+            if self._static_embed is None:
+                self._static_embed = self.build_static_embed()
+
+            embed = discord.Embed.from_dict(copy.deepcopy(self._static_embed))
+            embed.color = self.bot.main_color
+            embed.timestamp = discord.utils.utcnow()
+            embed.set_field_at(0, name="Uptime", value=self.bot.uptime)
+            embed.set_field_at(1, name="Latency", value=f"{self.bot.latency * 1000:.2f} ms")
+            message = await self.timed_send(ctx, embed=embed)
+        except BaseException:
+            # Only a reply that actually went out counts towards the window
+            pending.set_result(None)
+            if self._last_reply.get(channel_id, (None, None))[1] is pending:
+                del self._last_reply[channel_id]
+            raise
+        pending.set_result(message)
+
+        # The window runs from when the reply went out
+        now = time.monotonic()
+        self._last_reply[channel_id] = (now, pending)
+        if len(self._last_reply) > 256:
+            self._last_reply = {
+                k: v
+                for k, v in self._last_reply.items()
+                if not v[1].done() or now - v[0] < ABOUT_REPLY_WINDOW
+            }
+
+    @about.command(name="latency")
+    @checks.has_permissions(PermissionLevel.REGULAR)
+    async def about_latency(
+        self, ctx, minutes: commands.Range[int, 1, LATENCY_WINDOW_MINUTES] = LATENCY_WINDOW_MINUTES
+    ):
+        """Shows gateway heartbeat and REST latency percentiles over the last few minutes."""
+        since = time.monotonic() - minutes * 60
+        embed = discord.Embed(
+            title="Latency",
+            description=f"Over the last {minutes} minute(s).",
+            color=self.bot.main_color,
+            timestamp=discord.utils.utcnow(),
+        )
+        series = (
+            ("Gateway Heartbeat", self.heartbeat_latencies),
+            ("REST (about replies)", self.rest_latencies),
+        )
+        for name, samples in series:
+            values = sorted(ms for at, ms in samples if at >= since)
+            if not values:
+                embed.add_field(name=name, value="No samples yet.", inline=False)
+                continue
+            embed.add_field(
+                name=name,
+                value=(
+                    f"p50 `{percentile(values, 50):.0f} ms` · p95 `{percentile(values, 95):.0f} ms` · "
+                    f"p99 `{percentile(values, 99):.0f} ms` · max `{values[-1]:.0f} ms`\n"
+                    f"{len(values)} sample(s)"
+                ),
+                inline=False,
+            )
+        embed.add_field(name="Current Heartbeat", value=f"{self.bot.latency * 1000:.2f} ms")
+        await self.timed_send(ctx, embed=embed)
 
 async def setup(bot):
     result = bot.remove_command("about")
@@ -1,13 +1,27 @@
 from __future__ import annotations
 
+import abc
+import asyncio
+import contextlib
 import datetime
+import gzip
+import hashlib
 import json
 import math
+import os
+import time
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Literal, Optional
 
+import aiohttp
 import discord
 from discord.ext import commands
+from pymongo.errors import PyMongoError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 from core import checks
 from core.models import PermissionLevel, getLogger
@@ -24,110 +38,729 @@ __version__ = __plugin_info__["version"]
 
 logger = getLogger(__name__)
 
-API_BASE = "https://bots.wantuh.com"
+API_BASE = os.getenv("MIGRATE_API_BASE", "https://bots.wantuh.com")
 MIGRATE_ENDPOINT = API_BASE + "/api/migrate/plugin"
+EXPORT_DIR = Path(os.getenv("MIGRATE_EXPORT_DIR", "migrate_exports"))
+# Documents per chunk when the collection's average document size is unknown.
 CHUNK_SIZE = 2000
+MAX_CHUNK_DOCS = 10000
+# Chunks are sized against a raw JSON byte budget that adapts to upload latency.
+TARGET_CHUNK_BYTES = 4 * 1024 * 1024
+MIN_CHUNK_BYTES = 256 * 1024
+MAX_CHUNK_BYTES = 32 * 1024 * 1024
+TARGET_CHUNK_SECONDS = 2.0
+MAX_SIZE_RETRIES = 3
+SIZE_SAMPLE_DOCS = 50
+# Minimum seconds between progress message edits.
+PROGRESS_INTERVAL = 3.0
+CURSOR_BATCH_SIZE = 500
+UPLOAD_WINDOW = 4
+MAX_UPLOAD_WINDOW = 16
+PARALLEL_COLLECTIONS = 1
+MAX_PARALLEL_COLLECTIONS = 4
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+# Statuses that mean the API does not understand a compressed NDJSON chunk.
+TRANSPORT_REJECTED_STATUSES = frozenset((400, 404, 405, 406, 411, 415, 501))
+
+Transport = Literal["auto", "json", "gzip", "zstd"]
+Compression = Literal["none", "gzip", "zstd"]
+
+
+def _to_str(obj: Any) -> str:
+    return str(obj)
+
+
+def _to_isoformat(obj: Any) -> str:
+    return obj.isoformat()
+
+
+def _to_hex(obj: Any) -> str:
+    return obj.hex()
 
 
-def _make_serializable(obj: Any) -> Any:
+# BSON types are matched by name so bson does not have to be imported directly.
+_BSON_STR_TYPES = frozenset(("ObjectId", "Decimal128", "Int64", "Int32", "Timestamp"))
+
+# Exact type -> converter. Anything the json module encodes natively never reaches it,
+# and types resolved through the slow path in ``_json_default`` are cached here.
+_JSON_CONVERTERS: Dict[type, Any] = {
+    datetime.datetime: _to_isoformat,
+    datetime.date: _to_isoformat,
+    bytes: _to_hex,
+}
+
+
+def _json_default(obj: Any) -> Any:
     """
-    Recursively convert BSON/pymongo types to plain JSON-serializable Python objects.
-    Handles ObjectId, datetime, Decimal128, Int64, and bytes without importing bson directly.
+    Convert a value the json module cannot encode natively (ObjectId, datetime,
+    Decimal128, Timestamp, bytes and their subclasses) into a JSON-safe value.
     """
-    type_name = type(obj).__name__
-    if type_name in ("ObjectId", "Decimal128", "Int64", "Int32", "Timestamp"):
-        return str(obj)
-    if isinstance(obj, datetime.datetime):
-        return obj.isoformat()
-    if isinstance(obj, datetime.date):
-        return obj.isoformat()
-    if isinstance(obj, bytes):
-        return obj.hex()
-    if isinstance(obj, dict):
-        return {k: _make_serializable(v) for k, v in obj.items()}
-    if isinstance(obj, (list, tuple)):
-        return [_make_serializable(v) for v in obj]
-    return obj
+    obj_type = type(obj)
+    convert = _JSON_CONVERTERS.get(obj_type)
+    if convert is None:
+        if obj_type.__name__ in _BSON_STR_TYPES:
+            convert = _to_str
+        elif isinstance(obj, (datetime.datetime, datetime.date)):
+            convert = _to_isoformat
+        elif isinstance(obj, bytes):
+            convert = _to_hex
+        else:
+            raise TypeError(f"Object of type {obj_type.__name__} is not JSON serializable")
+        _JSON_CONVERTERS[obj_type] = convert
+    return convert(obj)
 
 
-def _serialize(docs: list) -> list:
-    """Convert a list of BSON documents to JSON-safe plain Python dicts."""
-    return [_make_serializable(doc) for doc in docs]
+_ENCODER = json.JSONEncoder(default=_json_default, separators=(",", ":"))
 
 
-class Migrate(commands.Cog, name=__plugin_name__):
-    """Exports all MongoDB collections to the Wantuh Modmail dashboard."""
+def _encode_document(doc: dict) -> bytes:
+    """
+    Encode a BSON document straight to JSON bytes.
+
+    The C encoder walks the document itself and only calls back into Python for values
+    that need converting, so JSON-safe subtrees are never copied.
+    """
+    return _ENCODER.encode(doc).encode("utf-8")
+
+
+def _token_hash(token: str) -> str:
+    """Checkpoints are keyed by a hash so the migration token itself is never stored."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+async def _stream_chunks(
+    collection, chunk_size: int, limit: int, after_id: Any = None
+) -> AsyncIterator[tuple]:
+    """
+    Lazily yield ``(documents, last_id)`` chunks of at most ``chunk_size`` JSON-encoded
+    documents from a collection, with the ``_id`` of the chunk's last document.
+
+    Documents are read in ``_id`` order, starting after ``after_id`` when it is given, so
+    a resumed export continues right after the last acknowledged document even if others
+    were inserted or deleted in between. The cursor is read in batches of
+    CURSOR_BATCH_SIZE and capped at ``limit`` documents, so the number of chunks never
+    exceeds the totalChunks announced to the API even if documents are inserted while
+    the export is running. Only one chunk is held at a time.
+    """
+    query = {} if after_id is None else {"_id": {"$gt": after_id}}
+    cursor = collection.find(query, batch_size=CURSOR_BATCH_SIZE).sort("_id", 1).limit(limit)
+    chunk: List[bytes] = []
+    last_id = after_id
+    async for doc in cursor:
+        chunk.append(_encode_document(doc))
+        last_id = doc["_id"]
+        if len(chunk) >= chunk_size:
+            yield chunk, last_id
+            chunk = []
+    if chunk:
+        yield chunk, last_id
+
+
+async def _indexed_chunks(
+    collection,
+    total_docs: int,
+    total_chunks: int,
+    chunk_size: int,
+    start_chunk: int,
+    after_id: Any = None,
+) -> AsyncIterator[tuple]:
+    """
+    Yield ``(chunk_index, documents, last_id)`` for every chunk index from ``start_chunk``
+    up to ``total_chunks``. ``after_id`` is the ``_id`` the chunk before ``start_chunk``
+    ended on.
+
+    Documents deleted mid-export leave the announced chunk count short; the tail is
+    padded with empty chunks so the API still sees every chunk index.
+    """
+    limit = max(total_docs - start_chunk * chunk_size, 0)
+    chunk_index = start_chunk - 1
+    last_id = after_id
+    async for chunk, last_id in _stream_chunks(collection, chunk_size, limit, after_id):
+        chunk_index += 1
+        yield chunk_index, chunk, last_id
+    for chunk_index in range(chunk_index + 1, total_chunks):
+        yield chunk_index, [], last_id
+
+
+async def _wait_for_slot(in_flight: set, window: int) -> None:
+    """Block until fewer than ``window`` uploads are in flight, re-raising the first failure."""
+    while len(in_flight) >= window:
+        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        in_flight.difference_update(done)
+        errors = [task.exception() for task in done if task.exception() is not None]
+        if errors:
+            raise errors[0]
 
-    def __init__(self, bot: ModmailBot):
-        self.bot: ModmailBot = bot
 
+async def _drain(in_flight: set) -> None:
+    """Wait for every in-flight upload, re-raising the first failure."""
+    await _wait_for_slot(in_flight, 1)
 
-    async def _update_embed(
+
+def _compress(encoding: str, data: bytes) -> bytes:
+    if encoding == "none":
+        return data
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+class _PayloadTooLarge(RuntimeError):
+    """The API refused a chunk with 413; ``size`` is the rejected body size in bytes."""
+
+    def __init__(self, size: int):
+        super().__init__(f"Chunk of {_format_bytes(size)} rejected as too large (HTTP 413)")
+        self.size = size
+
+
+async def _read_body(resp: aiohttp.ClientResponse) -> dict:
+    """Parse a JSON response body, tolerating empty or non-JSON error pages."""
+    try:
+        body = await resp.json(content_type=None)
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+def _resolve_compression(compression: str) -> str:
+    if compression == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if compression == "zstd" and zstandard is None:
+        logger.warning("zstandard is not installed; compressing migration chunks with gzip.")
+        return "gzip"
+    return compression
+
+
+class _ChunkSink(abc.ABC):
+    """
+    Destination for chunks of pre-encoded documents.
+
+    The sink owns the chunk byte budget. For an ``adaptive`` sink every acknowledged
+    chunk nudges it towards the size that would be handled in TARGET_CHUNK_SECONDS, and
+    a 413 halves it. Subclasses implement ``_post``, returning the API-style response body.
+    """
+
+    # Checkpoints are stored under this key; ``None`` disables checkpointing.
+    checkpoint_key: Optional[str] = None
+    # Shown in the progress embed footer.
+    label: str = ""
+    # Whether chunk latency tunes the byte budget, and the budget is worth keeping
+    # for the next migration.
+    adaptive: bool = True
+
+    def __init__(self, chunk_bytes: int = TARGET_CHUNK_BYTES):
+        self.chunk_bytes = chunk_bytes
+        self.chunks_sent = 0
+        self.docs_sent = 0
+        self.bytes_sent = 0
+
+    async def post(
         self,
-        msg: discord.Message,
-        title: str,
-        color: int,
-        collection_names: list,
-        results: Dict[str, str],
-        footer: Optional[str] = None,
-    ) -> None:
-        embed = discord.Embed(title=title, color=color)
-        lines = [f"**{n}**: {results.get(n, 'Waiting')}" for n in collection_names]
-        embed.description = "\n".join(lines)
-        if footer:
-            embed.set_footer(text=footer)
-        await msg.edit(embed=embed)
+        collection: str,
+        chunk_index: int,
+        total_chunks: int,
+        documents: List[bytes],
+    ) -> dict:
+        """POST a single chunk and feed its latency into the byte budget; raises on non-200."""
+        raw_bytes = sum(len(doc) for doc in documents)
+        started = time.monotonic()
+        body = await self._post(collection, chunk_index, total_chunks, documents)
+        latency = time.monotonic() - started
+
+        self.chunks_sent += 1
+        self.docs_sent += len(documents)
+        self.bytes_sent += raw_bytes
+        # Chunks far below the budget (collection tails, small collections) say little
+        # about how a full chunk would fare.
+        if self.adaptive and raw_bytes >= self.chunk_bytes // 4:
+            scale = min(2.0, max(0.5, TARGET_CHUNK_SECONDS / max(latency, 0.001)))
+            self._set_budget((self.chunk_bytes + raw_bytes * scale) / 2)
+        return body
+
+    def shrink(self, rejected_size: int) -> None:
+        """Halve the byte budget after the API rejected a chunk of ``rejected_size`` bytes."""
+        self._set_budget(min(self.chunk_bytes, rejected_size) / 2)
+
+    def _set_budget(self, chunk_bytes: float) -> None:
+        self.chunk_bytes = int(min(MAX_CHUNK_BYTES, max(MIN_CHUNK_BYTES, chunk_bytes)))
+
+    @abc.abstractmethod
+    async def _post(
+        self,
+        collection: str,
+        chunk_index: int,
+        total_chunks: int,
+        documents: List[bytes],
+    ) -> dict:
+        """Deliver one chunk and return the API-style response body."""
 
-    async def _post_chunk(
+
+class _ChunkUploader(_ChunkSink):
+    """
+    POSTs chunks of pre-encoded documents to the migration API.
+
+    With a compressed transport each chunk is sent as gzip- or zstd-compressed NDJSON,
+    with the token and chunk metadata in headers. When the API rejects that form the
+    uploader steps down from zstd to gzip and then to the plain JSON body, and keeps the
+    accepted transport for the rest of the migration.
+    """
+
+    def __init__(
         self,
+        session: aiohttp.ClientSession,
         token: str,
+        transport: str,
+        chunk_bytes: int = TARGET_CHUNK_BYTES,
+    ):
+        super().__init__(chunk_bytes)
+        self.session = session
+        self.token = token
+        self.transport = "json" if transport == "json" else _resolve_compression(transport)
+        self.checkpoint_key = _token_hash(token)
+        self.label = "Token: " + (token[:32] + "…" if len(token) > 32 else token)
+
+    async def _post(
+        self,
         collection: str,
         chunk_index: int,
         total_chunks: int,
-        documents: list,
+        documents: List[bytes],
     ) -> dict:
-        """POST a single chunk; raises on non-200."""
-        payload = {
-            "token": token,
-            "collection": collection,
-            "chunkIndex": chunk_index,
-            "totalChunks": total_chunks,
-            "documents": documents,
-        }
-        async with self.bot.api.session.post(
+        transport = self.transport
+        while transport != "json":
+            body = await self._post_ndjson(transport, collection, chunk_index, total_chunks, documents)
+            if body is not None:
+                return body
+            fallback = "gzip" if transport == "zstd" else "json"
+            if self.transport == transport:
+                logger.warning(
+                    "Migration API rejected %s-compressed NDJSON; falling back to %s.",
+                    transport,
+                    fallback,
+                )
+                self.transport = fallback
+            transport = fallback
+        return await self._post_json(collection, chunk_index, total_chunks, documents)
+
+    async def _post_json(
+        self,
+        collection: str,
+        chunk_index: int,
+        total_chunks: int,
+        documents: List[bytes],
+    ) -> dict:
+        header = _ENCODER.encode(
+            {
+                "token": self.token,
+                "collection": collection,
+                "chunkIndex": chunk_index,
+                "totalChunks": total_chunks,
+            }
+        )
+        payload = b"".join(
+            (header[:-1].encode("utf-8"), b',"documents":[', b",".join(documents), b"]}")
+        )
+        async with self.session.post(
             MIGRATE_ENDPOINT,
-            json=payload,
+            data=payload,
             headers={"Content-Type": "application/json"},
         ) as resp:
-            body = await resp.json()
+            if resp.status == 413:
+                raise _PayloadTooLarge(len(payload))
+            body = await _read_body(resp)
             if resp.status != 200:
                 error = body.get("error", f"HTTP {resp.status}")
                 raise RuntimeError(error)
             return body
 
+    async def _post_ndjson(
+        self,
+        transport: str,
+        collection: str,
+        chunk_index: int,
+        total_chunks: int,
+        documents: List[bytes],
+    ) -> Optional[dict]:
+        """POST a compressed NDJSON chunk; returns ``None`` if the API rejects the format."""
+        raw = b"\n".join(documents) + b"\n" if documents else b""
+        # Compressing a multi-megabyte chunk would otherwise stall the event loop.
+        payload = await asyncio.to_thread(_compress, transport, raw)
+        async with self.session.post(
+            MIGRATE_ENDPOINT,
+            data=payload,
+            headers={
+                "Content-Type": "application/x-ndjson",
+                "Content-Encoding": transport,
+                "X-Migrate-Token": self.token,
+                "X-Migrate-Collection": collection,
+                "X-Migrate-Chunk-Index": str(chunk_index),
+                "X-Migrate-Total-Chunks": str(total_chunks),
+            },
+        ) as resp:
+            if resp.status in TRANSPORT_REJECTED_STATUSES:
+                return None
+            if resp.status == 413:
+                raise _PayloadTooLarge(len(raw))
+            body = await _read_body(resp)
+            if resp.status != 200:
+                error = body.get("error", f"HTTP {resp.status}")
+                raise RuntimeError(error)
+            return body
 
-    @commands.command(name="dbmigrate")
-    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
-    async def migrate(self, ctx: commands.Context, token: str):
-        """
-        Migrates all MongoDB collections to the Wantuh dashboard.
 
-        Usage: `{prefix}migrate <token>`
+class _FileSink(_ChunkSink):
+    """
+    Writes each chunk as an optionally compressed NDJSON file under ``directory``.
 
-        The migration token is generated on the Wantuh dashboard and is valid
-        for 24 hours. The token is never stored — the invocation message is
-        deleted immediately for security.
+    Files are named ``<collection>/chunk-<index>-of-<total>.ndjson[.gz|.zst]`` so an
+    export can be checked for completeness, and are written from a worker thread.
+    """
 
-        Requires permission level: **Administrator (4)**.
-        """
+    SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+    # Local disk latency says nothing about what the migration API will accept
+    adaptive = False
+
+    def __init__(self, directory: Path, compression: str, chunk_bytes: int = TARGET_CHUNK_BYTES):
+        super().__init__(chunk_bytes)
+        self.directory = directory
+        self.compression = _resolve_compression(compression)
+        self.label = f"Exporting to {directory}"
+        self._written: Dict[str, int] = {}
+
+    async def _post(
+        self,
+        collection: str,
+        chunk_index: int,
+        total_chunks: int,
+        documents: List[bytes],
+    ) -> dict:
+        width = len(str(total_chunks))
+        path = (
+            self.directory
+            / collection
+            / f"chunk-{chunk_index:0{width}d}-of-{total_chunks}.ndjson{self.SUFFIXES[self.compression]}"
+        )
+        await asyncio.to_thread(self._write, path, documents)
+        self._written[collection] = self._written.get(collection, 0) + len(documents)
+        return {"totalInserted": self._written[collection]}
+
+    def _write(self, path: Path, documents: List[bytes]) -> None:
+        raw = b"\n".join(documents) + b"\n" if documents else b""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(_compress(self.compression, raw))
+
+
+class _ProgressReporter:
+    """
+    Applies migration progress to the status message from a background task.
+
+    Workers call ``publish`` after changing the shared status, which never blocks. The
+    task renders the latest status at most once every PROGRESS_INTERVAL seconds, so any
+    burst of updates collapses into one edit, and rate-limit backoff on the edit only
+    delays the next progress update, not the uploads. ``close`` always applies the
+    final state.
+    """
+
+    def __init__(self, msg: discord.Message, render, interval: float = PROGRESS_INTERVAL):
+        self.msg = msg
+        self.render = render
+        self.interval = interval
+        self._dirty = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def publish(self) -> None:
+        self._dirty.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            try:
+                await self.msg.edit(embed=self.render())
+            except discord.HTTPException as exc:
+                logger.warning("Failed to update migration progress: %s", exc)
+            await asyncio.sleep(self.interval)
+
+    def cancel(self) -> None:
+        self._task.cancel()
+
+    async def close(self, embed: discord.Embed) -> None:
+        self._task.cancel()
         try:
-            await ctx.message.delete()
-        except discord.Forbidden:
+            await self._task
+        except asyncio.CancelledError:
             pass
+        await self.msg.edit(embed=embed)
 
-        db = self.bot.api.db
 
-        collection_names: list = await db.list_collection_names()
+class Migrate(commands.Cog, name=__plugin_name__):
+    """Exports all MongoDB collections to the Wantuh Modmail dashboard."""
+
+    def __init__(self, bot: ModmailBot):
+        self.bot: ModmailBot = bot
+        self.db = bot.api.get_plugin_partition(self)
+        # Byte budget learned by the last migration, reused as the next one's starting point.
+        self.chunk_bytes = TARGET_CHUNK_BYTES
+
+    def _timed(self, name):
+        """Times a block in ``bot.plugin_metrics`` while the PluginStats plugin is loaded."""
+        metrics = getattr(self.bot, "plugin_metrics", None)
+        if metrics is None:
+            return contextlib.nullcontext()
+        return metrics.timed(self, name)
+
+    def _build_embed(
+        self,
+        title: str,
+        color: int,
+        collection_names: list,
+        results: Dict[str, str],
+        footer: Optional[str] = None,
+        summary: Optional[str] = None,
+    ) -> discord.Embed:
+        embed = discord.Embed(title=title, color=color)
+        lines = [f"**{n}**: {results.get(n, 'Waiting')}" for n in collection_names]
+        if summary:
+            lines += ["", summary]
+        embed.description = "\n".join(lines)
+        if footer:
+            embed.set_footer(text=footer)
+        return embed
+
+    async def _load_checkpoints(self, token_hash: str) -> Dict[str, dict]:
+        """Return the stored checkpoints for a token, keyed by collection name."""
+        return {doc["collection"]: doc async for doc in self.db.find({"token_hash": token_hash})}
+
+    async def _save_checkpoint(self, token_hash: str, coll_name: str, **fields: Any) -> None:
+        await self.db.update_one(
+            {"_id": f"checkpoint:{token_hash}:{coll_name}"},
+            {"$set": {"token_hash": token_hash, "collection": coll_name, **fields}},
+            upsert=True,
+        )
+
+    async def _plan_chunk_size(self, coll_name: str, chunk_bytes: int) -> int:
+        """
+        Return how many documents of a collection fit in ``chunk_bytes``, estimated from
+        the encoded size of a random sample of its documents.
+        """
+        try:
+            sample = await self.bot.api.db[coll_name].aggregate(
+                [{"$sample": {"size": SIZE_SAMPLE_DOCS}}]
+            ).to_list(None)
+        except PyMongoError:
+            return CHUNK_SIZE
+        if not sample:
+            return CHUNK_SIZE
+        avg_size = sum(len(_encode_document(doc)) for doc in sample) / len(sample)
+        return max(1, min(MAX_CHUNK_DOCS, int(chunk_bytes // avg_size)))
+
+    async def _migrate_collection(
+        self,
+        uploader: _ChunkSink,
+        coll_name: str,
+        window: int,
+        results: Dict[str, str],
+        report,
+        checkpoint: Optional[dict] = None,
+    ) -> Optional[int]:
+        """
+        Upload one collection, restarting it with smaller chunks if the API answers 413.
+
+        The chunk layout is announced through totalChunks, so it cannot change partway
+        through a collection; instead the collection is sent again from chunk 0.
+        """
+        for attempt in range(MAX_SIZE_RETRIES + 1):
+            try:
+                return await self._upload_collection(
+                    uploader, coll_name, window, results, report, checkpoint
+                )
+            except _PayloadTooLarge as exc:
+                if attempt == MAX_SIZE_RETRIES:
+                    raise
+                uploader.shrink(exc.size)
+                logger.warning(
+                    "Collection '%s': %s. Restarting with a %s budget.",
+                    coll_name,
+                    exc,
+                    _format_bytes(uploader.chunk_bytes),
+                )
+                checkpoint = None
+                if uploader.checkpoint_key is not None:
+                    await self.db.delete_one(
+                        {"_id": f"checkpoint:{uploader.checkpoint_key}:{coll_name}"}
+                    )
+                results[coll_name] = "Chunks too large — restarting with smaller chunks…"
+                report()
+
+    async def _upload_collection(
+        self,
+        uploader: _ChunkSink,
+        coll_name: str,
+        window: int,
+        results: Dict[str, str],
+        report,
+        checkpoint: Optional[dict] = None,
+    ) -> Optional[int]:
+        """
+        Stream one collection to the API and return the number of documents inserted,
+        or ``None`` if the collection is empty.
+
+        Up to ``window`` chunk POSTs are kept in flight while the next chunk is read and
+        serialized. The first chunk is acknowledged before any other is sent and the last
+        chunk only after all others, so the API still observes the start and end of each
+        collection in order. Any failed chunk cancels the remaining uploads and is re-raised.
+
+        Every time the run of contiguously acknowledged chunks grows, it is persisted as a
+        checkpoint together with the ``_id`` of the last acknowledged document. Passing
+        that ``checkpoint`` back in continues after that document with the same chunk
+        layout.
+        """
+        collection = self.bot.api.db[coll_name]
+        checkpoint_key = uploader.checkpoint_key
+
+        if checkpoint is not None:
+            total_docs = checkpoint["total_docs"]
+            total_chunks = checkpoint["total_chunks"]
+            chunk_size = checkpoint["chunk_size"]
+            acked_chunks = checkpoint["acked_chunks"]
+            last_id = checkpoint["last_id"]
+            total_inserted = checkpoint["inserted"]
+            prior_elapsed = checkpoint["elapsed"]
+        else:
+            with self._timed("mongo.count_documents"):
+                total_docs = await collection.count_documents({})
+            if not total_docs:
+                return None
+            with self._timed("mongo.plan_chunk_size"):
+                chunk_size = await self._plan_chunk_size(coll_name, uploader.chunk_bytes)
+            total_chunks = math.ceil(total_docs / chunk_size)
+            acked_chunks = 0
+            last_id = None
+            total_inserted = 0
+            prior_elapsed = 0.0
+
+        start_chunk = acked_chunks
+        start_id = last_id
+        # Chunk index -> _id of its last document, for chunks acknowledged out of order
+        acked_ahead: Dict[int, Any] = {}
+        save_lock = asyncio.Lock()
+        started = time.monotonic()
+
+        logger.info(
+            "Migrating collection '%s': %d doc(s) in %d chunk(s) of %d from chunk %d, window %d.",
+            coll_name,
+            total_docs,
+            total_chunks,
+            chunk_size,
+            start_chunk,
+            window,
+        )
+
+        async def checkpoint_progress() -> None:
+            if checkpoint_key is None:
+                return
+            # Serialized so a slower write can never overwrite a newer checkpoint.
+            async with save_lock:
+                with self._timed("mongo.save_checkpoint"):
+                    await self._save_checkpoint(
+                        checkpoint_key,
+                        coll_name,
+                        total_docs=total_docs,
+                        total_chunks=total_chunks,
+                        chunk_size=chunk_size,
+                        acked_chunks=acked_chunks,
+                        last_id=last_id,
+                        inserted=total_inserted,
+                        elapsed=prior_elapsed + time.monotonic() - started,
+                        done=acked_chunks == total_chunks,
+                    )
+
+        async def upload(chunk_index: int, documents: List[bytes], chunk_last_id: Any) -> None:
+            nonlocal acked_chunks, last_id, total_inserted
+            with self._timed("chunk.post"):
+                body = await uploader.post(coll_name, chunk_index, total_chunks, documents)
+            # Chunks may be acknowledged out of order; the running total only grows.
+            acked_ahead[chunk_index] = chunk_last_id
+            total_inserted = max(total_inserted, body.get("totalInserted", total_inserted))
+            results[coll_name] = (
+                f"Chunk {acked_chunks + len(acked_ahead)}/{total_chunks} — "
+                f"{total_inserted} docs sent"
+            )
+            logger.debug(
+                "Collection '%s' chunk %d/%d acknowledged — %d inserted so far.",
+                coll_name,
+                chunk_index + 1,
+                total_chunks,
+                total_inserted,
+            )
+
+            if acked_chunks in acked_ahead:
+                while acked_chunks in acked_ahead:
+                    last_id = acked_ahead.pop(acked_chunks)
+                    acked_chunks += 1
+                await checkpoint_progress()
+            report()
+
+        in_flight: set = set()
+        try:
+            async for chunk_index, documents, chunk_last_id in _indexed_chunks(
+                collection, total_docs, total_chunks, chunk_size, start_chunk, start_id
+            ):
+                if chunk_index == total_chunks - 1:
+                    await _drain(in_flight)
+                    await upload(chunk_index, documents, chunk_last_id)
+                elif chunk_index == start_chunk:
+                    await upload(chunk_index, documents, chunk_last_id)
+                else:
+                    await _wait_for_slot(in_flight, window)
+                    task = asyncio.create_task(upload(chunk_index, documents, chunk_last_id))
+                    in_flight.add(task)
+            await _drain(in_flight)
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        return total_inserted
+
+    async def _run_migration(
+        self,
+        ctx: commands.Context,
+        uploader: _ChunkSink,
+        window: int,
+        parallel: int,
+        resume: bool,
+    ):
+        db = self.bot.api.db
+        token_hash = uploader.checkpoint_key
+
+        if resume:
+            checkpoints = await self._load_checkpoints(token_hash)
+            if not checkpoints:
+                return await ctx.send(
+                    embed=discord.Embed(
+                        title="Migration Error",
+                        color=self.bot.error_color,
+                        description="No checkpoint found for this token. Start a new migration instead.",
+                    )
+                )
+        else:
+            if token_hash is not None:
+                await self.db.delete_many({"token_hash": token_hash})
+            checkpoints = {}
+
+        # This plugin's own partition holds the checkpoints and changes while exporting.
+        collection_names: list = [
+            name for name in await db.list_collection_names() if name != self.db.name
+        ]
         if not collection_names:
             return await ctx.send(
                 embed=discord.Embed(
@@ -142,7 +775,7 @@ class Migrate(commands.Cog, name=__plugin_name__):
         results: Dict[str, str] = {}
         status_msg = await ctx.send(
             embed=discord.Embed(
-                title="Migration Starting…",
+                title="Resuming Migration…" if resume else "Migration Starting…",
                 color=self.bot.main_color,
                 description=(
                     f"Found **{len(collection_names)}** collection(s): "
@@ -152,91 +785,190 @@ class Migrate(commands.Cog, name=__plugin_name__):
             )
         )
 
-        overall_success = True
-        masked_token = token[:32] + "…" if len(token) > 32 else token
+        time_saved = 0.0
+        started = time.monotonic()
 
-        for coll_name in collection_names:
-            results[coll_name] = "Fetching from DB…"
-            await self._update_embed(
-                status_msg,
+        reporter = _ProgressReporter(
+            status_msg,
+            lambda: self._build_embed(
                 "Migration In Progress…",
                 self.bot.main_color,
                 collection_names,
                 results,
-                footer=f"Token: {masked_token}",
+                footer=uploader.label,
+            ),
+        )
+        report = reporter.publish
+
+        slots = asyncio.Semaphore(parallel)
+
+        async def run(coll_name: str) -> bool:
+            nonlocal time_saved
+            checkpoint = checkpoints.get(coll_name)
+            if checkpoint is not None:
+                time_saved += checkpoint["elapsed"]
+                if checkpoint["done"]:
+                    results[coll_name] = f"Already done — {checkpoint['inserted']} docs"
+                    return True
+
+            async with slots:
+                results[coll_name] = "Fetching from DB…"
+                report()
+
+                try:
+                    total_inserted = await self._migrate_collection(
+                        uploader, coll_name, window, results, report, checkpoint
+                    )
+                except RuntimeError as exc:
+                    logger.error("Collection '%s' migration failed: %s", coll_name, exc)
+                    results[coll_name] = f"API error: `{exc}`"
+                    return False
+                except Exception as exc:
+                    logger.exception("Unexpected error migrating collection '%s'.", coll_name)
+                    results[coll_name] = f"`{type(exc).__name__}: {exc}`"
+                    return False
+
+                if total_inserted is None:
+                    results[coll_name] = "Empty — skipped"
+                else:
+                    results[coll_name] = f"Done — {total_inserted} docs"
+                return True
+
+        try:
+            outcomes = await asyncio.gather(*(run(c) for c in collection_names))
+        except BaseException:
+            reporter.cancel()
+            raise
+        overall_success = all(outcomes)
+        elapsed = time.monotonic() - started
+        if uploader.adaptive:
+            self.chunk_bytes = uploader.chunk_bytes
+
+        summary = None
+        if uploader.chunks_sent:
+            summary = (
+                f"{uploader.chunks_sent} chunk(s), "
+                f"avg {_format_bytes(uploader.bytes_sent / uploader.chunks_sent)} • "
+                f"{_format_bytes(uploader.bytes_sent / elapsed)}/s, "
+                f"{uploader.docs_sent / elapsed:.0f} docs/s"
             )
 
-            try:
-                raw_docs = await db[coll_name].find({}).to_list(None)
+        if overall_success and token_hash is not None:
+            await self.db.delete_many({"token_hash": token_hash})
+
+        footer = f"Requested by {ctx.author}"
+        if not overall_success and token_hash is not None:
+            footer += f" • Resume with {self.bot.prefix}dbmigrate resume <token>"
+        if resume:
+            footer += f" • Resume saved ~{datetime.timedelta(seconds=round(time_saved))}"
+
+        await reporter.close(
+            self._build_embed(
+                title="Migration Complete" if overall_success else "Migration Finished with Errors",
+                color=self.bot.main_color if overall_success else self.bot.error_color,
+                collection_names=collection_names,
+                results=results,
+                footer=footer,
+                summary=summary,
+            )
+        )
 
-                if not raw_docs:
-                    results[coll_name] = "Empty — skipped"
-                    continue
+    @commands.group(name="dbmigrate", invoke_without_command=True)
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def migrate(
+        self,
+        ctx: commands.Context,
+        token: str,
+        transport: Optional[Transport] = None,
+        window: commands.Range[int, 1, MAX_UPLOAD_WINDOW] = UPLOAD_WINDOW,
+        parallel: commands.Range[int, 1, MAX_PARALLEL_COLLECTIONS] = PARALLEL_COLLECTIONS,
+    ):
+        """
+        Migrates all MongoDB collections to the Wantuh dashboard.
 
-                docs = _serialize(raw_docs)
-                total_docs = len(docs)
-                total_chunks = math.ceil(total_docs / CHUNK_SIZE)
-                total_inserted = 0
+        Usage: `{prefix}dbmigrate <token> [transport] [window] [parallel]`
 
-                logger.info(
-                    "Migrating collection '%s': %d doc(s) in %d chunk(s).",
-                    coll_name,
-                    total_docs,
-                    total_chunks,
-                )
+        The migration token is generated on the Wantuh dashboard and is valid
+        for 24 hours. The token is never stored — the invocation message is
+        deleted immediately for security.
 
-                for chunk_index in range(total_chunks):
-                    chunk = docs[chunk_index * CHUNK_SIZE : (chunk_index + 1) * CHUNK_SIZE]
+        `transport` is one of `json` (the default), `gzip`, `zstd` or `auto`.
+        Compression is opt-in: compressed transports send NDJSON chunks and
+        fall back to plain JSON if the dashboard does not accept them.
+        `window` is the number of chunk uploads kept in flight per collection
+        (default 4, max 16). `parallel` is the number of collections migrated
+        at the same time (default 1, max 4).
 
-                    body = await self._post_chunk(
-                        token=token,
-                        collection=coll_name,
-                        chunk_index=chunk_index,
-                        total_chunks=total_chunks,
-                        documents=chunk,
-                    )
+        If the migration fails partway through, continue it with
+        `{prefix}dbmigrate resume <token>`.
 
-                    total_inserted = body.get("totalInserted", total_inserted)
-                    results[coll_name] = (
-                        f"Chunk {chunk_index + 1}/{total_chunks} — {total_inserted} docs sent"
-                    )
-                    await self._update_embed(
-                        status_msg,
-                        "Migration In Progress…",
-                        self.bot.main_color,
-                        collection_names,
-                        results,
-                        footer=f"Token: {masked_token}",
-                    )
+        Requires permission level: **Administrator (4)**.
+        """
+        try:
+            await ctx.message.delete()
+        except discord.Forbidden:
+            pass
 
-                    logger.debug(
-                        "Collection '%s' chunk %d/%d — %d inserted so far.",
-                        coll_name,
-                        chunk_index + 1,
-                        total_chunks,
-                        total_inserted,
-                    )
+        uploader = _ChunkUploader(
+            self.bot.api.session, token, transport or "json", self.chunk_bytes
+        )
+        await self._run_migration(ctx, uploader, window, parallel, resume=False)
 
-                results[coll_name] = f"Done — {total_inserted} docs"
+    @migrate.command(name="resume")
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def migrate_resume(
+        self,
+        ctx: commands.Context,
+        token: str,
+        transport: Optional[Transport] = None,
+        window: commands.Range[int, 1, MAX_UPLOAD_WINDOW] = UPLOAD_WINDOW,
+        parallel: commands.Range[int, 1, MAX_PARALLEL_COLLECTIONS] = PARALLEL_COLLECTIONS,
+    ):
+        """
+        Resumes an interrupted migration from its last acknowledged chunk.
 
-            except RuntimeError as exc:
-                logger.error("Collection '%s' migration failed: %s", coll_name, exc)
-                results[coll_name] = f"API error: `{exc}`"
-                overall_success = False
+        Usage: `{prefix}dbmigrate resume <token> [transport] [window] [parallel]`
 
-            except Exception as exc:
-                logger.exception("Unexpected error migrating collection '%s'.", coll_name)
-                results[coll_name] = f"`{type(exc).__name__}: {exc}`"
-                overall_success = False
+        Collections that already finished are skipped, and partially uploaded
+        collections continue after the last chunk the dashboard acknowledged.
+        Only a hash of the token is kept in the checkpoint.
 
-        await self._update_embed(
-            status_msg,
-            title="Migration Complete" if overall_success else "Migration Finished with Errors",
-            color=self.bot.main_color if overall_success else self.bot.error_color,
-            collection_names=collection_names,
-            results=results,
-            footer=f"Requested by {ctx.author}",
+        Requires permission level: **Administrator (4)**.
+        """
+        try:
+            await ctx.message.delete()
+        except discord.Forbidden:
+            pass
+
+        uploader = _ChunkUploader(
+            self.bot.api.session, token, transport or "json", self.chunk_bytes
         )
+        await self._run_migration(ctx, uploader, window, parallel, resume=True)
+
+    @migrate.command(name="export")
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def migrate_export(
+        self,
+        ctx: commands.Context,
+        compression: Compression = "gzip",
+        window: commands.Range[int, 1, MAX_UPLOAD_WINDOW] = UPLOAD_WINDOW,
+        parallel: commands.Range[int, 1, MAX_PARALLEL_COLLECTIONS] = PARALLEL_COLLECTIONS,
+    ):
+        """
+        Exports all MongoDB collections to NDJSON files on the bot's host.
+
+        Usage: `{prefix}dbmigrate export [compression] [window] [parallel]`
+
+        Uses the same cursor, serialization and chunking as a migration, but
+        writes each chunk to a timestamped folder under `MIGRATE_EXPORT_DIR`
+        (default `migrate_exports`) instead of uploading it. `compression` is
+        one of `none`, `gzip` (default) or `zstd`.
+
+        Requires permission level: **Administrator (4)**.
+        """
+        directory = EXPORT_DIR / datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d-%H%M%S")
+        sink = _FileSink(directory.resolve(), compression, self.chunk_bytes)
+        await self._run_migration(ctx, sink, window, parallel, resume=False)
 
 
 async def setup(bot: ModmailBot) -> None:
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import os
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import discord
+from aiohttp import web
+from discord.ext import commands, tasks
+
+from core import checks
+from core.models import PermissionLevel, getLogger
+from core.paginator import EmbedPaginatorSession
+
+if TYPE_CHECKING:
+    from bot import ModmailBot
+
+info_json = Path(__file__).parent.resolve() / "info.json"
+with open(info_json, encoding="utf-8") as f:
+    __plugin_info__ = json.loads(f.read())
+
+__plugin_name__ = __plugin_info__["name"]
+__version__ = __plugin_info__["version"]
+__description__ = "\n".join(__plugin_info__["description"])
+
+logger = getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in seconds. Anything slower lands in a
+# final overflow bucket.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Prometheus text export, both off unless configured
+PROM_FILE = os.getenv("PLUGINSTATS_PROM_FILE")  # Rewritten every PROM_FILE_INTERVAL seconds
+PROM_FILE_INTERVAL = 15
+PROM_PORT = os.getenv("PLUGINSTATS_PROM_PORT")  # Serves /metrics on this port
+PROM_HOST = os.getenv("PLUGINSTATS_PROM_HOST", "127.0.0.1")
+
+# Metrics listed per page of the pluginstats embed
+STATS_PAGE_SIZE = 15
+
+
+class Histogram:
+    """Call count, error count, total time and fixed-bucket latency histogram of one metric."""
+
+    __slots__ = ("buckets", "count", "errors", "total")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float, error: bool = False) -> None:
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if error:
+            self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile; ``inf`` for the overflow bucket."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self) -> _Timer:
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # A cancelled call didn't fail, it just stopped being waited for
+        error = exc_type is not None and not issubclass(exc_type, asyncio.CancelledError)
+        self.histogram.observe(time.perf_counter() - self.started, error)
+
+
+class MetricsRegistry:
+    """
+    In-process metrics shared by the plugins, available as ``bot.plugin_metrics`` while this
+    plugin is loaded. Metrics are keyed by plugin (the cog name) and a dotted metric name
+    such as ``command.rename``, ``mongo.load_roles`` or ``http.generate``.
+
+    Other plugins can't import this one. They look it up with
+    ``getattr(bot, "plugin_metrics", None)``, record through :meth:`timed` and
+    :meth:`count`, and skip recording when it is None.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.counters: Dict[Tuple[str, str], int] = {}
+
+    def histogram(self, plugin: str, name: str) -> Histogram:
+        key = (plugin, name)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        return histogram
+
+    def observe(self, plugin: str, name: str, seconds: float, error: bool = False) -> None:
+        self.histogram(plugin, name).observe(seconds, error)
+
+    def timer(self, plugin: str, name: str) -> _Timer:
+        """Context manager timing its block; an exception escaping it counts as an error."""
+        return _Timer(self.histogram(plugin, name))
+
+    def inc(self, plugin: str, name: str, value: int = 1) -> None:
+        key = (plugin, name)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def timed(self, cog: commands.Cog, name: str) -> _Timer:
+        """:meth:`timer` for one of ``cog``'s metrics."""
+        return self.timer(cog.qualified_name, name)
+
+    def count(self, cog: commands.Cog, name: str, value: int = 1) -> None:
+        """:meth:`inc` for one of ``cog``'s counters."""
+        self.inc(cog.qualified_name, name, value)
+
+    def plugins(self) -> list:
+        return sorted({plugin for plugin, _ in self.histograms} | {plugin for plugin, _ in self.counters})
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP modmail_plugin_duration_seconds Time spent in plugin commands, listeners and calls.",
+            "# TYPE modmail_plugin_duration_seconds histogram",
+        ]
+        errors = []
+        for (plugin, name), histogram in sorted(self.histograms.items()):
+            labels = f'plugin="{_escape(plugin)}",name="{_escape(name)}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.buckets):
+                cumulative += count
+                lines.append(f'modmail_plugin_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'modmail_plugin_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"modmail_plugin_duration_seconds_sum{{{labels}}} {histogram.total}")
+            lines.append(f"modmail_plugin_duration_seconds_count{{{labels}}} {histogram.count}")
+            errors.append(f"modmail_plugin_errors_total{{{labels}}} {histogram.errors}")
+
+        lines.append("# HELP modmail_plugin_errors_total Timed plugin calls that raised.")
+        lines.append("# TYPE modmail_plugin_errors_total counter")
+        lines.extend(errors)
+
+        lines.append("# HELP modmail_plugin_events_total Plugin event counters.")
+        lines.append("# TYPE modmail_plugin_events_total counter")
+        for (plugin, name), value in sorted(self.counters.items()):
+            lines.append(f'modmail_plugin_events_total{{plugin="{_escape(plugin)}",name="{_escape(name)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds == float("inf"):
+        return f"> {BUCKETS[-1]:g} s"
+    return f"≤ {seconds * 1000:g} ms"
+
+
+class PluginStats(commands.Cog, name=__plugin_name__):
+    """Call counts, error rates and latencies of commands and plugin internals."""
+
+    def __init__(self, bot: ModmailBot):
+        self.bot: ModmailBot = bot
+        # Keep the numbers collected so far when the plugin is reloaded
+        self.metrics: MetricsRegistry = getattr(bot, "plugin_metrics", None) or MetricsRegistry()
+        self._prom_runner: Optional[web.AppRunner] = None
+
+    async def cog_load(self):
+        self.bot.plugin_metrics = self.metrics
+        if PROM_FILE:
+            self.write_prom_file.start()
+        if PROM_PORT:
+            app = web.Application()
+            app.router.add_get("/metrics", self._serve_metrics)
+            self._prom_runner = web.AppRunner(app, access_log=None)
+            await self._prom_runner.setup()
+            await web.TCPSite(self._prom_runner, PROM_HOST, int(PROM_PORT)).start()
+            logger.info("Serving plugin metrics on http://%s:%s/metrics.", PROM_HOST, PROM_PORT)
+
+    async def cog_unload(self):
+        # Instrumented plugins fall back to not recording anything
+        if getattr(self.bot, "plugin_metrics", None) is self.metrics:
+            del self.bot.plugin_metrics
+        self.write_prom_file.cancel()
+        if self._prom_runner is not None:
+            await self._prom_runner.cleanup()
+
+    async def _serve_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.metrics.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    @tasks.loop(seconds=PROM_FILE_INTERVAL)
+    async def write_prom_file(self):
+        await asyncio.to_thread(self._write_prom_file, self.metrics.render_prometheus())
+
+    @staticmethod
+    def _write_prom_file(text: str) -> None:
+        # Replace atomically so a scraper never reads a half-written file
+        path = Path(PROM_FILE)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+
+    @commands.Cog.listener()
+    async def on_command(self, ctx: commands.Context):
+        ctx.pluginstats_started = time.perf_counter()
+
+    @commands.Cog.listener()
+    async def on_command_completion(self, ctx: commands.Context):
+        self._observe_command(ctx, error=False)
+
+    @commands.Cog.listener()
+    async def on_command_error(self, ctx: commands.Context, error: commands.CommandError):
+        self._observe_command(ctx, error=True)
+
+    def _observe_command(self, ctx: commands.Context, error: bool) -> None:
+        started = getattr(ctx, "pluginstats_started", None)
+        if started is None or ctx.command is None:
+            return
+        plugin = ctx.cog.qualified_name if ctx.cog is not None else "Bot"
+        self.metrics.observe(plugin, f"command.{ctx.command.qualified_name}", time.perf_counter() - started, error)
+
+    @commands.group(name="pluginstats", invoke_without_command=True)
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def plugin_stats(self, ctx: commands.Context, *, plugin: str = None):
+        """
+        Shows call counts, error rates and p95 latencies per plugin.
+
+        Commands of every plugin are timed automatically; plugins that support it also
+        report their database, HTTP and listener calls. Pass a plugin name to only show
+        that plugin. Latencies are histogram bucket bounds, so p95 reads as "at most".
+
+        Requires permission level: **Administrator (4)**.
+        """
+        plugins = self.metrics.plugins()
+        if plugin is not None:
+            plugins = [name for name in plugins if name.lower() == plugin.lower()]
+        if not plugins:
+            return await ctx.send("No stats have been recorded yet." if plugin is None else f"No stats for `{plugin}`.")
+
+        embeds = []
+        for name in plugins:
+            histograms = sorted(
+                ((metric, h) for (owner, metric), h in self.metrics.histograms.items() if owner == name),
+                key=lambda item: item[1].count,
+                reverse=True,
+            )
+            lines = [
+                f"`{metric}` — {h.count} call(s), {h.errors / h.count:.1%} errors, p95 {_format_seconds(h.quantile(0.95))}"
+                for metric, h in histograms
+                if h.count
+            ]
+            lines.extend(
+                f"`{metric}` — {value}"
+                for (owner, metric), value in sorted(self.metrics.counters.items())
+                if owner == name
+            )
+            for start in range(0, len(lines), STATS_PAGE_SIZE):
+                embed = discord.Embed(
+                    title=f"Plugin Stats — {name}",
+                    description="\n".join(lines[start : start + STATS_PAGE_SIZE]),
+                    color=self.bot.main_color,
+                )
+                embeds.append(embed)
+
+        session = EmbedPaginatorSession(ctx, *embeds)
+        await session.run()
+
+    @plugin_stats.command(name="export")
+    @checks.has_permissions(PermissionLevel.ADMINISTRATOR)
+    async def plugin_stats_export(self, ctx: commands.Context):
+        """
+        Sends the current stats in the Prometheus text format.
+
+        Set `PLUGINSTATS_PROM_FILE` to also keep them in a file for a textfile collector,
+        or `PLUGINSTATS_PROM_PORT` to serve them at `/metrics`.
+
+        Requires permission level: **Administrator (4)**.
+        """
+        text = self.metrics.render_prometheus()
+        await ctx.send(file=discord.File(io.BytesIO(text.encode()), filename="plugin_metrics.prom"))
+
+
+async def setup(bot: ModmailBot):
+    await bot.add_cog(PluginStats(bot))
@@ -2,39 +2,143 @@ import discord
 from discord.ext import commands
 
 from core import checks
-from core.models import PermissionLevel
+from core.models import PermissionLevel, getLogger
 
+import asyncio
+import collections
+import contextlib
 import datetime
+import time
+
+logger = getLogger(__name__)
+
+RENAME_LIMIT = 2        # Discord allows 2 name changes per channel...
+RENAME_PERIOD = 600     # ...every 10 minutes
+MAX_NAME_LENGTH = 100   # Discord's channel name limit
+GLOBAL_RENAME_INTERVAL = 0.5  # Seconds between any two renames, across all channels
+BULK_PROGRESS_INTERVAL = 5    # Seconds between edits of the bulk rename summary
+
 
 class Rename(commands.Cog):
     """Rename a thread automatically!"""
 
     def __init__(self, bot):
         self.bot = bot
+        self.base_names = {}    # channel id -> ticket name before any handler was prepended
+        self._renamed_at = {}   # channel id -> times of the channel's recent renames
+        self._pending = {}      # channel id -> (name, future) of the rename waiting for a slot
+        self._applying = set()  # channel ids with a rename taken off _pending but not yet done
+        self._workers = {}      # channel id -> task applying that channel's renames
+        self._global_lock = asyncio.Lock()
+        self._last_edit = 0.0
 
-    @checks.thread_only()
-    @checks.has_permissions(PermissionLevel.SUPPORTER)
-    @commands.command()
-    async def rename(self, ctx):
+    def _timed(self, name):
+        """Times a block in ``bot.plugin_metrics`` while the PluginStats plugin is loaded."""
+        metrics = getattr(self.bot, 'plugin_metrics', None)
+        if metrics is None:
+            return contextlib.nullcontext()
+        return metrics.timed(self, name)
+
+    async def cog_unload(self):
+        for worker in self._workers.values():
+            worker.cancel()
+        for _, future in self._pending.values():
+            future.cancel()
+
+    def target_name(self, channel, handler):
+        """The channel's name with `handler` in front, without stacking on earlier handlers."""
+        base = self.base_names.setdefault(channel.id, channel.name)
+        return f"{handler}-{base}"[:MAX_NAME_LENGTH]
+
+    def next_rename_in(self, channel_id):
+        """Seconds until the channel has rename budget again, counting a rename still being applied."""
+        now = time.monotonic()
+        recent = list(self._renamed_at.get(channel_id, ()))
+        if channel_id in self._applying:
+            # It uses up a slot as soon as it goes through
+            recent.append(now)
+        if len(recent) < RENAME_LIMIT:
+            return 0
+        return max(recent[-RENAME_LIMIT] + RENAME_PERIOD - now, 0)
+
+    def schedule_rename(self, channel, name):
+        """
+        Queues a rename of `channel`. A rename still waiting for the same channel is replaced,
+        its future resolves to None. Returns a future resolving to the applied name, and the
+        seconds until it will be applied.
+        """
+        future = asyncio.get_running_loop().create_future()
+        superseded = self._pending.get(channel.id)
+        if superseded is not None and not superseded[1].done():
+            superseded[1].set_result(None)
+        self._pending[channel.id] = (name, future)
+
+        if channel.id not in self._workers:
+            self._workers[channel.id] = asyncio.create_task(self._apply_renames(channel))
+        return future, self.next_rename_in(channel.id)
+
+    async def _apply_renames(self, channel):
         try:
-            # Add reaction to indicate the process is starting
-            await ctx.message.add_reaction('⏰')
+            while channel.id in self._pending:
+                # Wait here rather than in discord.py's rate limit bucket, so that
+                # renames queued meanwhile are coalesced into the latest one
+                await asyncio.sleep(self.next_rename_in(channel.id))
+                name, future = self._pending.pop(channel.id)
+                try:
+                    if channel.name != name:
+                        self._applying.add(channel.id)
+                        await self._wait_global_slot()
+                        with self._timed('discord.channel_edit'):
+                            await channel.edit(name=name)
+                        recent = self._renamed_at.setdefault(channel.id, collections.deque(maxlen=RENAME_LIMIT))
+                        recent.append(time.monotonic())
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(name)
+                finally:
+                    self._applying.discard(channel.id)
+        finally:
+            self._workers.pop(channel.id, None)
 
-            # Get the username of the user who ran the command
-            user_who_ran_command = ctx.author.name
+    async def _wait_global_slot(self):
+        # Spaces renames out across channels, the edits themselves still run in parallel
+        async with self._global_lock:
+            delay = self._last_edit + GLOBAL_RENAME_INTERVAL - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last_edit = time.monotonic()
 
-            # Get the current channel name, which contains the ticket owner's username
-            current_channel_name = ctx.channel.name
+    @checks.has_permissions(PermissionLevel.SUPPORTER)
+    @commands.group(invoke_without_command=True)
+    async def rename(self, ctx):
+        # Checked here rather than with checks.thread_only() so `rename bulk` works anywhere
+        if ctx.thread is None:
+            return await ctx.reply(embed=discord.Embed(
+                description="This command can only be used in a Modmail thread.",
+                color=discord.Color.red()
+            ))
 
-            # Format the new channel name
-            new_channel_name = f"{user_who_ran_command}-{current_channel_name}"
+        # The username of the user who ran the command goes in front of the ticket name
+        new_channel_name = self.target_name(ctx.channel, ctx.author.name)
+        replacing = ctx.channel.id in self._pending
+        future, eta = self.schedule_rename(ctx.channel, new_channel_name)
 
-            # Edit the channel name
-            await ctx.channel.edit(name=new_channel_name)
+        if eta:
+            # Tell staff straight away instead of leaving the command looking hung
+            applies_at = discord.utils.utcnow() + datetime.timedelta(seconds=eta)
+            note = " It replaces the rename that was already waiting." if replacing else ""
+            await ctx.reply(
+                f"Discord only allows {RENAME_LIMIT} renames per channel every {RENAME_PERIOD // 60} minutes, "
+                f"so this channel will be renamed to `{new_channel_name}` {discord.utils.format_dt(applies_at, 'R')}.{note}"
+            )
 
-            # Clear the loading reaction and add a success reaction
-            await ctx.message.clear_reactions()
-            await ctx.message.add_reaction('✅')
+        try:
+            applied = await future
+            # A newer rename of this channel took its place
+            await ctx.message.add_reaction('✅' if applied else '⏭️')
         except discord.errors.Forbidden:
             embed = discord.Embed(
                 title='Forbidden',
@@ -45,15 +149,87 @@ class Rename(commands.Cog):
             embed.set_footer(text='Rename')
 
             await ctx.reply(embed=embed)
-
-            await ctx.message.clear_reactions()
             await ctx.message.add_reaction('❌')
+        except discord.errors.NotFound:
+            pass # The thread was closed before the rename could apply
         except Exception as e:
-            # Log the error if needed (optional)
-            print(f"Error during rename: {e}")
-
-            await ctx.message.clear_reactions()
+            logger.error("Error during rename: %s", e)
             await ctx.message.add_reaction('❌')
 
+    @checks.has_permissions(PermissionLevel.MODERATOR)
+    @rename.command(name='bulk')
+    async def rename_bulk(self, ctx, handler: discord.Member, category: discord.CategoryChannel = None):
+        """
+        Puts `handler`'s name in front of every open thread, or only those in `category`.
+        Renames are paced to Discord's rate limits; one message reports progress and failures.
+        """
+        channels = {}
+        for thread in self.bot.threads.cache.values():
+            channel = getattr(thread, 'channel', None)
+            if channel is None or (category is not None and channel.category_id != category.id):
+                continue
+            channels[channel.id] = channel
+
+        # Work out every target name before anything is renamed
+        targets = {channel: self.target_name(channel, handler.name) for channel in channels.values()}
+        targets = {channel: name for channel, name in targets.items() if channel.name != name}
+        if not targets:
+            return await ctx.reply(f"All {len(channels)} matching thread(s) are already named for {handler.name}.")
+
+        scheduled = {}
+        last_eta = 0
+        for channel, name in targets.items():
+            future, eta = self.schedule_rename(channel, name)
+            scheduled[future] = channel
+            last_eta = max(last_eta, eta)
+        finishes_at = discord.utils.utcnow() + datetime.timedelta(seconds=last_eta + len(targets) * GLOBAL_RENAME_INTERVAL)
+
+        embed = discord.Embed(title='Bulk Rename', color=self.bot.main_color)
+        embed.set_footer(text='Rename')
+        message = await ctx.reply(embed=self._bulk_summary(embed, scheduled, finishes_at))
+
+        pending = set(scheduled)
+        while pending:
+            _, pending = await asyncio.wait(pending, timeout=BULK_PROGRESS_INTERVAL)
+            embed = self._bulk_summary(embed, scheduled, finishes_at)
+            try:
+                await message.edit(embed=embed)
+            except discord.HTTPException as e:
+                logger.warning("Could not update the bulk rename summary: %s", e)
+
+        logger.info("Bulk rename for %s by %s: %s", handler, ctx.author, embed.description)
+
+    @staticmethod
+    def _bulk_summary(embed, scheduled, finishes_at):
+        renamed, superseded, failures = 0, 0, []
+        for future, channel in scheduled.items():
+            if not future.done():
+                continue
+            if future.cancelled():
+                failures.append(f"{channel.mention}: cancelled")
+            elif future.exception() is not None:
+                if not isinstance(future.exception(), discord.errors.NotFound): # The thread was closed
+                    failures.append(f"{channel.mention}: {future.exception()}")
+            elif future.result() is None:
+                superseded += 1
+            else:
+                renamed += 1
+
+        waiting = sum(not future.done() for future in scheduled)
+        embed.description = f"{renamed}/{len(scheduled)} renamed, {waiting} waiting, {len(failures)} failed"
+        if superseded:
+            embed.description += f", {superseded} replaced by a newer rename"
+        if waiting:
+            embed.description += f"\nExpected to finish {discord.utils.format_dt(finishes_at, 'R')}."
+
+        embed.clear_fields()
+        if failures:
+            value = "\n".join(failures)
+            if len(value) > 1024:
+                value = value[:1020].rsplit("\n", 1)[0] + "\n…"
+            embed.add_field(name='Failures', value=value, inline=False)
+        embed.color = discord.Color.red() if failures and not waiting else embed.color
+        return embed
+
 async def setup(bot):
     await bot.add_cog(Rename(bot))
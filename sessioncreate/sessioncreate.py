@@ -1,21 +1,288 @@
 import discord
 from discord.ext import commands
 import aiohttp
+import asyncio
+import collections
+import contextlib
 import os
-from core.thread import Thread 
-from core.models import DummyMessage # IMPORTANT: Import DummyMessage
+import random
+import time
+from core.thread import Thread
+from core.models import DummyMessage, getLogger # IMPORTANT: Import DummyMessage
+
+logger = getLogger(__name__)
+
+CDN_API_BASE = os.getenv('CDN_API_BASE', 'https://cdn.avionicsrblx.com') # Your CDN server
+GENERATE_ENDPOINT = CDN_API_BASE + '/api/logs/generate'
+
+# Connection settings for the long-lived CDN session
+CONNECTOR_LIMIT = 10        # Max simultaneous connections to the CDN
+DNS_CACHE_TTL = 300         # Seconds to cache the CDN's DNS lookup
+KEEPALIVE_TIMEOUT = 60      # Seconds to keep an idle connection open for reuse
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=8, connect=3) # Per attempt, see MAX_ATTEMPTS
+
+# Retries and circuit breaker for the generate call
+MAX_ATTEMPTS = 3            # Attempts per session, for connection errors, timeouts and 5xx/429
+RETRY_BASE_DELAY = 0.5      # Seconds; backoff is a random delay up to base * 2^attempt
+FAILURE_THRESHOLD = 5       # Consecutive failed attempts before the circuit opens
+RESET_TIMEOUT = 30          # Seconds the circuit stays open before letting one probe through
+
+# Warm pool of pre-generated upload sessions (0 disables the pool)
+SESSION_POOL_SIZE = int(os.getenv('CDN_SESSION_POOL_SIZE', '0'))
+SESSION_MAX_AGE = int(os.getenv('CDN_SESSION_MAX_AGE', '600')) # Seconds before a pooled session is considered stale
+POOL_RETRY_DELAY = 30       # Seconds to wait before refilling again after the CDN fails
+
+
+class CDNError(Exception):
+    """The CDN answered, but did not create a session. The message is staff-facing."""
+
+    def __init__(self, message, status=200):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def retryable(self):
+        # Server-side failures may succeed on retry; bad keys and bad requests won't
+        return self.status >= 500 or self.status == 429
+
+class CircuitOpenError(Exception):
+    """The CDN is considered down; calls fail fast until the next probe."""
+
+    def __init__(self, retry_in):
+        super().__init__(f"CDN circuit is open, next probe in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. After FAILURE_THRESHOLD consecutive failures it opens and
+    rejects calls for RESET_TIMEOUT seconds, then half-opens to let a single probe through.
+    A successful probe closes it again, a failed one re-opens it.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._probing = False
+        self.stats = {'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    @property
+    def retry_in(self):
+        if self.state != 'open':
+            return 0
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0)
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call should not be attempted."""
+        if self.state == 'open' and self.retry_in <= 0:
+            self.state = 'half-open'
+
+        if self.state == 'open' or (self.state == 'half-open' and self._probing):
+            self.stats['rejected'] += 1
+            raise CircuitOpenError(self.retry_in or self.reset_timeout)
+
+        if self.state == 'half-open':
+            self._probing = True
+
+    def record_success(self):
+        self.stats['successes'] += 1
+        self.state = 'closed'
+        self.failures = 0
+        self._probing = False
+
+    def release_probe(self):
+        """Frees the probe slot after a call that ended without telling us anything about the CDN."""
+        self._probing = False
+
+    def record_failure(self, error):
+        self.stats['failures'] += 1
+        self.failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        self._probing = False
+        if self.state == 'half-open' or self.failures >= self.failure_threshold:
+            if self.state != 'open':
+                self.stats['opened'] += 1
+                logger.warning("CDN circuit opened after %d failure(s), last: %s", self.failures, self.last_error)
+            self.state = 'open'
+            self.opened_at = time.monotonic()
 
 class LogSession(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.session = None # Created in cog_load, closed in cog_unload
+        self.api_key = None # Resolved in cog_load
+
+        # --- Warm session pool: (time generated, CDN response) pairs, oldest first ---
+        self.session_pool = collections.deque()
+        self.pool_stats = {'hits': 0, 'misses': 0, 'expired': 0}
+        self._refill_needed = asyncio.Event()
+        self._refill_task = None
+
+        self.breaker = CircuitBreaker()
+        self.retries = 0
+
+    def _timed(self, name):
+        """Times a block in ``bot.plugin_metrics`` while the PluginStats plugin is loaded."""
+        metrics = getattr(self.bot, 'plugin_metrics', None)
+        if metrics is None:
+            return contextlib.nullcontext()
+        return metrics.timed(self, name)
+
+    def _count(self, name, value=1):
+        """Counts an event in ``bot.plugin_metrics`` while the PluginStats plugin is loaded."""
+        metrics = getattr(self.bot, 'plugin_metrics', None)
+        if metrics is not None:
+            metrics.count(self, name, value)
+
+    async def cog_load(self):
         # Prefer environment variable for Docker deployments (CDN_API_KEY from .env via docker-compose)
         self.api_key = os.getenv('CDN_API_KEY')
-        
+
         if not self.api_key:
             # Fallback to config.ini if environment variable not set (less common for Docker, but good for flexibility)
-            self.api_key = self.bot.config.get('api_keys', 'CDN_API_KEY', fallback=None) 
+            self.api_key = self.bot.config.get('api_keys', 'CDN_API_KEY', fallback=None)
             if not self.api_key:
-                print("ERROR: CDN_API_KEY is not configured via environment variable or config.ini for LogSession cog. Commands might fail.")
+                logger.error("CDN_API_KEY is not configured via environment variable or config.ini for LogSession cog. Commands might fail.")
+
+        # One warm session for every command: DNS, TCP and TLS are paid once, not per session created
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=CONNECTOR_LIMIT,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ),
+            timeout=REQUEST_TIMEOUT,
+        )
+
+        if SESSION_POOL_SIZE > 0 and self.api_key:
+            self._refill_task = asyncio.create_task(self._refill_pool())
+            self._refill_needed.set()
+
+    async def cog_unload(self):
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+        if self.session is not None:
+            await self.session.close()
+
+    async def generate_session(self):
+        """
+        Asks the CDN for a new upload session and returns its response data.
+        Connection errors, timeouts, malformed answers and 5xx/429 answers are retried
+        with jittered exponential backoff. Raises CircuitOpenError while the CDN is
+        considered down, CDNError if the CDN refuses, aiohttp/timeout errors if it can't
+        be reached and ValueError if it keeps answering with something that isn't JSON.
+        """
+        for attempt in range(MAX_ATTEMPTS):
+            self.breaker.before_call()
+            try:
+                with self._timed('http.generate'):
+                    data = await self._request_session()
+            except CDNError as e:
+                if not e.retryable:
+                    # The CDN is up and answering, it just refused this request
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure(e)
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                # Unreachable, or answering with something other than the JSON we expect
+                # (e.g. a proxy's HTML error page)
+                self.breaker.record_failure(e)
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+            except asyncio.CancelledError:
+                # The caller stopped waiting, which says nothing about the CDN. Don't leave
+                # the half-open circuit waiting for a probe that will never report back.
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                self.breaker.record_failure(e)
+                raise
+            else:
+                self.breaker.record_success()
+                return data
+
+            self.retries += 1
+            await asyncio.sleep(random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt))
+
+    async def _request_session(self):
+        async with self.session.post(
+            GENERATE_ENDPOINT,
+            headers={
+                'api-key': self.api_key, # Use the API key from your config
+                'Content-Type': 'application/json'
+            },
+            timeout=REQUEST_TIMEOUT,
+        ) as response:
+            if response.status != 200:
+                try:
+                    error_data = await response.json(content_type=None) # Handle potential non-JSON errors
+                except ValueError:
+                    error_data = None
+                if not isinstance(error_data, dict):
+                    error_data = {}
+                error_message = str(error_data.get('error', f'Unknown error. Status: {response.status}'))
+                logger.warning("API Error from CDN server (%d): %s", response.status, error_message)
+                raise CDNError(f"Error from CDN server: {error_message[:250]}...", response.status) # Truncate for Discord
+
+            data = await response.json()
+
+        if not isinstance(data, dict) or not data.get('success'):
+            error = data.get('error', 'Unknown error from server.') if isinstance(data, dict) else 'Unexpected response from server.'
+            raise CDNError(f"Failed to create session: {error}")
+        return data
+
+    def take_pooled_session(self):
+        """Returns a fresh pre-generated session, or None if the pool has none."""
+        now = time.monotonic()
+        while self.session_pool:
+            created, data = self.session_pool.popleft()
+            if now - created <= SESSION_MAX_AGE:
+                self.pool_stats['hits'] += 1
+                self._count('pool.hit')
+                self._refill_needed.set()
+                return data
+            self.pool_stats['expired'] += 1
+
+        if SESSION_POOL_SIZE > 0:
+            self.pool_stats['misses'] += 1
+            self._count('pool.miss')
+            self._refill_needed.set()
+        return None
+
+    async def _refill_pool(self):
+        """Background task: keeps SESSION_POOL_SIZE unused sessions ready."""
+        while True:
+            await self._refill_needed.wait()
+            self._refill_needed.clear()
+
+            # Drop sessions that went stale while waiting
+            now = time.monotonic()
+            while self.session_pool and now - self.session_pool[0][0] > SESSION_MAX_AGE:
+                self.session_pool.popleft()
+                self.pool_stats['expired'] += 1
+
+            while len(self.session_pool) < SESSION_POOL_SIZE:
+                try:
+                    data = await self.generate_session()
+                except CircuitOpenError as e:
+                    # Don't add load while the CDN is down; try again once it may have recovered
+                    await asyncio.sleep(e.retry_in)
+                    continue
+                except (CDNError, aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    logger.warning("Could not pre-generate a log session: %s", e)
+                    await asyncio.sleep(POOL_RETRY_DELAY)
+                    continue
+                self.session_pool.append((time.monotonic(), data))
+
+            # Wake up again in time to replace the oldest session before it goes stale
+            if self.session_pool:
+                expires_in = SESSION_MAX_AGE - (time.monotonic() - self.session_pool[0][0])
+                asyncio.get_running_loop().call_later(max(expires_in, 0), self._refill_needed.set)
 
     @commands.command(name='createsession', aliases=['cs', 'newlogsession'])
     @commands.has_permissions(manage_channels=True) # Only allow users who can manage channels (staff)
@@ -33,107 +300,170 @@ class LogSession(commands.Cog):
             ticket = await Thread.from_channel(self.bot.threads, ctx.channel)
         except ValueError: # from_channel can raise ValueError if topic is malformed etc.
             return await ctx.send("This command can only be used in a valid Modmail ticket channel.")
-        
-        if not ticket: 
+
+        if not ticket:
             return await ctx.send("Could not retrieve ticket information from this channel.")
         # --------------------------------------------------------
 
-        # Send an initial message to the staff channel to show the bot is processing
-        # This message is not relayed to the user.
-        processing_message = await ctx.send("Generating a new log upload session, please wait...")
+        started = time.perf_counter()
 
-        api_endpoint = 'https://cdn.avionicsrblx.com/api/logs/generate' # Your CDN server endpoint
+        # A pre-generated session from the warm pool means no CDN round-trip at all
+        data = self.take_pooled_session()
+        source = 'pool' if data is not None else 'cdn'
+        processing_message = None
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    api_endpoint,
-                    headers={
-                        'api-key': self.api_key, # Use the API key from your config
-                        'Content-Type': 'application/json'
-                    }
-                ) as response:
-                    # --- Robust deletion for processing_message ---
-                    try:
-                        await processing_message.delete()
-                    except discord.NotFound:
-                        print("Warning: Processing message already deleted or not found.")
-                    # ---------------------------------------------
-
-                    if response.status != 200:
-                        error_data = await response.json(content_type=None) # Handle potential non-JSON errors
-                        error_message = error_data.get('error', f'Unknown error. Status: {response.status}')
-                        print(f"API Error from CDN server ({response.status}): {error_message}")
-                        # Staff-facing error
-                        return await ctx.send(f"Error from CDN server: {error_message[:250]}...") # Truncate for Discord
-
-                    data = await response.json()
-
-                    if data.get('success'):
-                        upload_link = data.get('uploadLink')
-                        view_link = data.get('viewLink')
-                        session_id = data.get('sessionId', 'N/A')
-
-                        # Construct the message content for the Modmail reply via the ticket object
-                        # This message WILL be relayed to the user's DM.
-                        message_to_send_to_user = f"> <:avionicsserverlogo:1384211042300858500> **Console Log Upload Link** \n\n Please click the link attached below to upload your Roblox Console Logs. \n\n **Link:** {upload_link}"
-
-                        # --- Create a DummyMessage object for the ticket.reply() method ---
-                        # Pass ctx.message as the base message, then set/clear attributes
-                        dummy_message = DummyMessage(ctx.message) 
-                        dummy_message.content = message_to_send_to_user
-                        dummy_message.author = ctx.author # The author of the command (staff)
-                        dummy_message.attachments = []    # Clear attachments from original message
-                        dummy_message.embeds = []         # Clear embeds from original message
-                        dummy_message.components = []     # Clear components
-                        dummy_message.stickers = []       # Clear stickers
-
-                        # Call ticket.reply - this sends the message to the user's DM and staff channel
-                        staff_msgs, user_msgs = await ticket.reply(dummy_message)
-
-                        # --- Added robust check for user_msgs for logging ---
-                        if isinstance(user_msgs, list) and user_msgs:
-                            print(f"Successfully sent log session link to user's DM: {user_msgs[0].id}")
-                        else:
-                            print("Warning: User message not found or not a list in ticket.reply response. Check Modmail settings.")
-                        # ----------------------------------------------------------------
-
-                        # Create and send the embed for the staff view link.
-                        # This embed is for staff eyes only and is NOT relayed to the user's DM.
-                        view_embed = discord.Embed(
-                            title="Staff View Link for Session",
-                            description="Staff can use this link to view the uploaded images.",
-                            color=discord.Color.green(), # Green color for success
-                            timestamp=discord.utils.utcnow() # Current UTC time
-                        )
-                        view_embed.add_field(name="Staff View Link", value=f"[Click Here]({view_link})", inline=False)
-                        view_embed.set_footer(text=f"Session ID: {session_id}")
-                        
-                        await ctx.send(embed=view_embed) # Send to staff channel only
-
-                        print(f"Log session created by {ctx.author} in ticket {ctx.channel.id} (Session ID: {session_id})")
-
-                    else:
-                        await ctx.send(f"Failed to create session: {data.get('error', 'Unknown error from server.')}") # Staff-facing error
+            if data is None:
+                # Send an initial message to the staff channel to show the bot is processing
+                # This message is not relayed to the user.
+                processing_message = await ctx.send("Generating a new log upload session, please wait...")
+                # generate_session has already released the CDN response by the time it returns
+                data = await self.generate_session()
+            cdn_done = time.perf_counter()
+
+            upload_link = data.get('uploadLink')
+            view_link = data.get('viewLink')
+            session_id = data.get('sessionId', 'N/A')
+
+            # Construct the message content for the Modmail reply via the ticket object
+            # This message WILL be relayed to the user's DM.
+            message_to_send_to_user = f"> <:avionicsserverlogo:1384211042300858500> **Console Log Upload Link** \n\n Please click the link attached below to upload your Roblox Console Logs. \n\n **Link:** {upload_link}"
+
+            # --- Create a DummyMessage object for the ticket.reply() method ---
+            # Pass ctx.message as the base message, then set/clear attributes
+            dummy_message = DummyMessage(ctx.message)
+            dummy_message.content = message_to_send_to_user
+            dummy_message.author = ctx.author # The author of the command (staff)
+            dummy_message.attachments = []    # Clear attachments from original message
+            dummy_message.embeds = []         # Clear embeds from original message
+            dummy_message.components = []     # Clear components
+            dummy_message.stickers = []       # Clear stickers
+
+            # Create and send the embed for the staff view link.
+            # This embed is for staff eyes only and is NOT relayed to the user's DM.
+            view_embed = discord.Embed(
+                title="Staff View Link for Session",
+                description="Staff can use this link to view the uploaded images.",
+                color=discord.Color.green(), # Green color for success
+                timestamp=discord.utils.utcnow() # Current UTC time
+            )
+            view_embed.add_field(name="Staff View Link", value=f"[Click Here]({view_link})", inline=False)
+            view_embed.set_footer(text=f"Session ID: {session_id}")
 
+            # The relay to the user, the staff embed and the processing message cleanup don't
+            # depend on each other, so run them together. A failure in one doesn't cancel the others.
+            reply_result, embed_result, _ = await asyncio.gather(
+                ticket.reply(dummy_message),      # Sends the message to the user's DM and staff channel
+                ctx.send(embed=view_embed),       # Send to staff channel only
+                self._delete_processing_message(processing_message),
+                return_exceptions=True,
+            )
+            processing_message = None
+            relay_done = time.perf_counter()
+
+            if isinstance(embed_result, Exception):
+                logger.error("Could not send the staff view link for session %s: %s", session_id, embed_result)
+
+            if isinstance(reply_result, Exception):
+                logger.error("Could not relay log session %s to the user: %s", session_id, reply_result)
+                await ctx.send(
+                    f"The session was created but the link could not be sent to the user: `{reply_result}`. "
+                    f"Upload link: {upload_link}"
+                ) # Staff-facing error
+            else:
+                # --- Robust check for user_msgs for logging ---
+                staff_msgs, user_msgs = reply_result
+                if isinstance(user_msgs, list) and user_msgs:
+                    logger.debug("Sent log session link to user's DM: %s", user_msgs[0].id)
+                else:
+                    logger.warning("User message not found or not a list in ticket.reply response. Check Modmail settings.")
+
+            logger.info(
+                "Log session created by %s in ticket %s (Session ID: %s): %s %.0fms, relay %.0fms, total %.0fms",
+                ctx.author, ctx.channel.id, session_id, source,
+                (cdn_done - started) * 1000, (relay_done - cdn_done) * 1000, (relay_done - started) * 1000,
+            )
+
+        except CircuitOpenError as e:
+            self._count('cdn.rejected')
+            await self._delete_processing_message(processing_message)
+            await ctx.send(
+                f"The CDN server is currently unavailable, so no session was created. "
+                f"The bot will check again in about {e.retry_in:.0f}s; see `{self.bot.prefix}cdnstatus`."
+            ) # Staff-facing error
+        except CDNError as e:
+            await self._delete_processing_message(processing_message)
+            await ctx.send(str(e)) # Staff-facing error
         except aiohttp.ClientError as e:
-            # --- Robust deletion for processing_message in error handling ---
-            try:
-                await processing_message.delete()
-            except discord.NotFound:
-                pass # Already handled or not found, proceed with error message
-            # --------------------------------------------------------------
+            await self._delete_processing_message(processing_message)
             await ctx.send(f"Network error communicating with CDN server: `{e}`. Please ensure the server is running.") # Staff-facing error
+        except asyncio.TimeoutError:
+            await self._delete_processing_message(processing_message)
+            await ctx.send("The CDN server did not respond in time. Please try again shortly.") # Staff-facing error
         except Exception as e:
-            # --- Robust deletion for processing_message in error handling ---
-            try:
-                await processing_message.delete()
-            except discord.NotFound:
-                pass # Already handled or not found, proceed with error message
-            # --------------------------------------------------------------
+            await self._delete_processing_message(processing_message)
             await ctx.send(f"An unexpected error occurred: `{e}`. Please check bot logs.") # Staff-facing error
-            print(f"Unexpected error in create_session_command: {e}")
+            logger.error("Unexpected error in create_session_command: %s", e, exc_info=True)
+
+    async def _delete_processing_message(self, processing_message):
+        # --- Robust deletion for processing_message in error handling ---
+        if processing_message is None:
+            return
+        try:
+            await processing_message.delete()
+        except discord.NotFound:
+            logger.debug("Processing message already deleted or not found.")
+
+    @commands.command(name='sessionpool')
+    @commands.has_permissions(manage_channels=True) # Staff only, same as createsession
+    async def session_pool_command(self, ctx):
+        """
+        Shows the warm pool of pre-generated log upload sessions.
+        Usage: .sessionpool
+        """
+        embed = discord.Embed(title="Log Session Pool", color=discord.Color.blurple())
+        if SESSION_POOL_SIZE <= 0:
+            embed.description = "The session pool is disabled. Set `CDN_SESSION_POOL_SIZE` to enable it."
+            return await ctx.send(embed=embed)
+
+        now = time.monotonic()
+        oldest = f"{now - self.session_pool[0][0]:.0f}s" if self.session_pool else "N/A"
+        served = self.pool_stats['hits'] + self.pool_stats['misses']
+        hit_rate = f"{self.pool_stats['hits'] / served:.0%}" if served else "N/A"
+
+        embed.add_field(name="Ready", value=f"{len(self.session_pool)}/{SESSION_POOL_SIZE}")
+        embed.add_field(name="Oldest", value=f"{oldest} (max {SESSION_MAX_AGE}s)")
+        embed.add_field(name="Hits / Misses", value=f"{self.pool_stats['hits']} / {self.pool_stats['misses']} ({hit_rate})")
+        embed.add_field(name="Expired", value=str(self.pool_stats['expired']))
+        await ctx.send(embed=embed)
+
+    @commands.command(name='cdnstatus')
+    @commands.has_permissions(manage_channels=True) # Staff only, same as createsession
+    async def cdn_status_command(self, ctx):
+        """
+        Shows whether the bot currently considers the CDN server up.
+        Usage: .cdnstatus
+        """
+        breaker = self.breaker
+        colors = {'closed': discord.Color.green(), 'half-open': discord.Color.orange(), 'open': discord.Color.red()}
+        embed = discord.Embed(title="CDN Status", color=colors[breaker.state])
+        embed.add_field(name="Circuit", value=f"`{breaker.state}`")
+        if breaker.state == 'open':
+            embed.add_field(name="Next Probe", value=f"in {breaker.retry_in:.0f}s")
+        embed.add_field(name="Consecutive Failures", value=f"{breaker.failures}/{breaker.failure_threshold}")
+        embed.add_field(
+            name="Totals",
+            value=(
+                f"{breaker.stats['successes']} ok, {breaker.stats['failures']} failed, "
+                f"{self.retries} retried, {breaker.stats['rejected']} rejected while open, "
+                f"opened {breaker.stats['opened']} time(s)"
+            ),
+            inline=False,
+        )
+        if breaker.last_error:
+            embed.add_field(name="Last Error", value=f"`{breaker.last_error[:1000]}`", inline=False)
+        await ctx.send(embed=embed)
 
 async def setup(bot):
     """Adds the LogSession cog to the bot."""
-    await bot.add_cog(LogSession(bot))
\ No newline at end of file
+    await bot.add_cog(LogSession(bot))
@@ -0,0 +1,102 @@
+"""
+Benchmark the migrate plugin's export pipeline (cursor -> encoder -> chunking -> sink)
+by exporting a seeded database to local NDJSON files.
+
+The database is an in-process mongomock-motor instance by default, or a real mongod
+with ``--mongo-uri``. Modmail's ``core`` package is stood in for by
+``fakebot.install_core_shim()``, so no Modmail checkout is needed::
+
+    python tools/bench_export.py --docs 20000 --compression gzip
+    python tools/bench_export.py --mongo-uri mongodb://localhost:27017
+
+Reports docs/sec, MiB/sec of encoded JSON and the process's peak RSS.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fakebot import install_core_shim  # noqa: E402
+
+install_core_shim()
+
+from bench_serializer import make_log  # noqa: E402
+from migrate.migrate import CHUNK_SIZE, _FileSink, _indexed_chunks  # noqa: E402
+
+DB_NAME = "modmail_bench"
+SEED_BATCH = 1000
+
+
+def _client(mongo_uri):
+    if mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        return AsyncIOMotorClient(mongo_uri)
+    from mongomock_motor import AsyncMongoMockClient
+
+    return AsyncMongoMockClient()
+
+
+async def seed(db, docs: int, messages: int, seed_value: int) -> None:
+    rng = random.Random(seed_value)
+    await db.logs.drop()
+    for start in range(0, docs, SEED_BATCH):
+        await db.logs.insert_many([make_log(rng, messages) for _ in range(min(SEED_BATCH, docs - start))])
+
+
+async def export(db, directory: Path, compression: str, chunk_size: int) -> tuple:
+    sink = _FileSink(directory, compression)
+    total_docs = await db.logs.count_documents({})
+    total_chunks = math.ceil(total_docs / chunk_size)
+    started = time.perf_counter()
+    async for chunk_index, documents, _ in _indexed_chunks(db.logs, total_docs, total_chunks, chunk_size, 0):
+        await sink.post("logs", chunk_index, total_chunks, documents)
+    return sink, time.perf_counter() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the migrate export pipeline.")
+    parser.add_argument("--mongo-uri", help="use this mongod instead of mongomock-motor")
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=40, help="messages per thread log")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="documents per chunk")
+    parser.add_argument("--compression", choices=("none", "gzip", "zstd"), default="none")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    client = _client(args.mongo_uri)
+    db = client[DB_NAME]
+    print(f"Seeding {args.docs} thread logs x {args.messages} messages…")
+    await seed(db, args.docs, args.messages, args.seed)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sink, elapsed = await export(db, Path(tmp), args.compression, args.chunk_size)
+        on_disk = sum(f.stat().st_size for f in Path(tmp).rglob("*") if f.is_file())
+
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    mib = sink.bytes_sent / 1024 / 1024
+    print(f"chunks      {sink.chunks_sent}")
+    print(f"documents   {sink.docs_sent} in {elapsed:.2f} s -> {sink.docs_sent / elapsed:,.0f} docs/s")
+    print(f"encoded     {mib:.1f} MiB -> {mib / elapsed:.1f} MiB/s")
+    print(f"on disk     {on_disk / 1024 / 1024:.1f} MiB ({args.compression})")
+    # ru_maxrss is in KiB on Linux.
+    print(f"peak RSS    {rss_peak / 1024:.1f} MiB (after seeding: {rss_before / 1024:.1f} MiB)")
+
+    if args.mongo_uri:
+        await client.drop_database(DB_NAME)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
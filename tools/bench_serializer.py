@@ -0,0 +1,150 @@
+"""
+Benchmark the migrate plugin's JSON document encoder against the original
+``_make_serializable`` + ``json.dumps`` pipeline on synthetic Modmail thread logs.
+
+Modmail's ``core`` package is stood in for by ``fakebot.install_core_shim()``, so no
+Modmail checkout is needed::
+
+    python tools/bench_serializer.py --docs 5000 --messages 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fakebot import install_core_shim  # noqa: E402
+
+install_core_shim()
+
+from migrate.migrate import _encode_document  # noqa: E402
+
+try:
+    from bson import ObjectId
+except ImportError:  # pragma: no cover - bson ships with pymongo/motor
+
+    class ObjectId:
+        """Stand-in with the same name and str() shape as bson.ObjectId."""
+
+        def __init__(self) -> None:
+            self._hex = "".join(random.choices("0123456789abcdef", k=24))
+
+        def __str__(self) -> str:
+            return self._hex
+
+
+def legacy_make_serializable(obj):
+    """The serializer shipped before the JSON encoder, kept here for comparison."""
+    type_name = type(obj).__name__
+    if type_name in ("ObjectId", "Decimal128", "Int64", "Int32", "Timestamp"):
+        return str(obj)
+    if isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, bytes):
+        return obj.hex()
+    if isinstance(obj, dict):
+        return {k: legacy_make_serializable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [legacy_make_serializable(v) for v in obj]
+    return obj
+
+
+def _user(rng: random.Random) -> dict:
+    user_id = str(rng.randrange(10**17, 10**18))
+    return {
+        "id": user_id,
+        "name": "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 12))),
+        "discriminator": "0",
+        "avatar_url": f"https://cdn.discordapp.com/avatars/{user_id}/{rng.getrandbits(64):x}.png",
+        "mod": rng.random() < 0.5,
+    }
+
+
+def make_log(rng: random.Random, messages: int) -> dict:
+    """Build a document shaped like a Modmail ``logs`` entry."""
+    created = datetime.datetime(2024, 1, 1) + datetime.timedelta(seconds=rng.randrange(10**7))
+    recipient = _user(rng)
+    return {
+        "_id": ObjectId(),
+        "key": f"{rng.getrandbits(48):012x}",
+        "open": False,
+        "created_at": created,
+        "closed_at": (created + datetime.timedelta(hours=2)).isoformat(),
+        "channel_id": str(rng.randrange(10**17, 10**18)),
+        "guild_id": str(rng.randrange(10**17, 10**18)),
+        "bot_id": str(rng.randrange(10**17, 10**18)),
+        "recipient": recipient,
+        "creator": recipient,
+        "closer": _user(rng),
+        "close_message": None,
+        "nsfw": False,
+        "title": None,
+        "messages": [
+            {
+                "timestamp": (created + datetime.timedelta(minutes=i)).isoformat(),
+                "message_id": str(rng.randrange(10**17, 10**18)),
+                "content": " ".join(
+                    "".join(rng.choices(string.ascii_letters, k=rng.randint(2, 9)))
+                    for _ in range(rng.randint(3, 40))
+                ),
+                "author": recipient if i % 2 else _user(rng),
+                "type": "thread_message",
+                "attachments": [],
+                "edited": False,
+            }
+            for i in range(messages)
+        ],
+    }
+
+
+def bench(name: str, func, repeat: int) -> float:
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<10} {best * 1000:9.1f} ms  {size / 1024 / 1024:7.2f} MiB")
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=2000, help="documents per chunk")
+    parser.add_argument("--messages", type=int, default=40, help="messages per thread log")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    docs = [make_log(rng, args.messages) for _ in range(args.docs)]
+    header = {"token": "x" * 64, "collection": "logs", "chunkIndex": 0, "totalChunks": 1}
+
+    def legacy() -> int:
+        payload = dict(header, documents=[legacy_make_serializable(doc) for doc in docs])
+        return len(json.dumps(payload).encode("utf-8"))
+
+    def encoder() -> int:
+        encoded = [_encode_document(doc) for doc in docs]
+        head = json.dumps(header, separators=(",", ":"))
+        return len(b"".join((head[:-1].encode(), b',"documents":[', b",".join(encoded), b"]}")))
+
+    print(f"{args.docs} docs x {args.messages} messages, best of {args.repeat}")
+    legacy_time = bench("legacy", legacy, args.repeat)
+    encoder_time = bench("encoder", encoder, args.repeat)
+    print(f"speedup    {legacy_time / encoder_time:9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Measure how long each plugin in this repository takes to import and to set up (``setup()``
+including ``cog_load``), loading them one after another the way Modmail does at startup.
+Uses the fake bot from ``fakebot.py``, so no Discord connection is needed::
+
+    python tools/bench_startup.py
+    python tools/bench_startup.py --rounds 20 --mongo-uri mongodb://localhost:27017
+
+Each round re-imports every plugin from scratch. Work a plugin hands off to a background
+task in ``cog_load`` is not included; that is the point of handing it off.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Read by the plugins at import time
+os.environ.setdefault("CDN_API_KEY", "test")
+
+import aiohttp  # noqa: E402
+
+from fakebot import FakeBot, install_core_shim  # noqa: E402
+
+install_core_shim()
+
+DB_NAME = "modmail_bench_startup"
+
+
+def discover_plugins() -> list:
+    """Every ``<name>/<name>.py`` in the repository."""
+    return sorted(path.parent.name for path in ROOT.glob("*/*.py") if path.stem == path.parent.name)
+
+
+def _client(mongo_uri):
+    if mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        return AsyncIOMotorClient(mongo_uri)
+    from mongomock_motor import AsyncMongoMockClient
+
+    return AsyncMongoMockClient()
+
+
+async def load_all(bot: FakeBot, plugins: list) -> dict:
+    """Import and set up every plugin in turn; returns plugin -> (import s, setup s)."""
+    timings = {}
+    for name in plugins:
+        module_name = f"{name}.{name}"
+        sys.modules.pop(module_name, None)
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        imported = time.perf_counter()
+        await module.setup(bot)
+        timings[name] = (imported - started, time.perf_counter() - imported)
+    return timings
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure plugin import and setup time.")
+    parser.add_argument("plugins", nargs="*", help="plugins to load (default: all)")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--mongo-uri", help="use this mongod instead of mongomock-motor")
+    args = parser.parse_args()
+    plugins = args.plugins or discover_plugins()
+
+    client = _client(args.mongo_uri)
+    results = {name: ([], []) for name in plugins}
+    totals = []
+    async with aiohttp.ClientSession() as session:
+        for _ in range(args.rounds):
+            bot = FakeBot(client[DB_NAME], session)
+            started = time.perf_counter()
+            timings = await load_all(bot, plugins)
+            totals.append(time.perf_counter() - started)
+            for name, (import_s, setup_s) in timings.items():
+                results[name][0].append(import_s)
+                results[name][1].append(setup_s)
+            for cog_name in list(bot.cogs):
+                await bot.remove_cog(cog_name)
+
+    if args.mongo_uri:
+        await client.drop_database(DB_NAME)
+
+    print(f"{'plugin':<15}{'import ms':>11}{'setup ms':>10}{'total ms':>10}   (median of {args.rounds})")
+    for name, (imports, setups) in results.items():
+        import_ms = statistics.median(imports) * 1000
+        setup_ms = statistics.median(setups) * 1000
+        print(f"{name:<15}{import_ms:>11.2f}{setup_ms:>10.2f}{import_ms + setup_ms:>10.2f}")
+    print(f"{'all plugins':<15}{'':>11}{'':>10}{statistics.median(totals) * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
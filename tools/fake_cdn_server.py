@@ -0,0 +1,102 @@
+"""
+Local stub of the CDN's log session endpoint, for exercising the sessioncreate plugin
+offline. Point the plugin at it with::
+
+    python tools/fake_cdn_server.py --port 8081 --api-key test
+    CDN_API_BASE=http://127.0.0.1:8081 CDN_API_KEY=test <start the bot>
+
+Every POST to ``/api/logs/generate`` with the right ``api-key`` header returns a new
+session. ``GET /stats`` reports how many sessions were generated.
+
+Faults can be injected to exercise the plugin's retries and circuit breaker:
+``--latency`` delays every generate call, ``--error-rate`` answers that fraction of calls
+with ``--error-status`` (500 by default). Both can be changed while the server runs with
+``POST /faults`` and a JSON body such as ``{"error_rate": 1.0}`` to simulate an outage.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import random
+import uuid
+
+from aiohttp import web
+
+ENDPOINT = "/api/logs/generate"
+
+
+def make_app(
+    api_key: str = "test", latency: float = 0.0, error_rate: float = 0.0, error_status: int = 500
+) -> web.Application:
+    """
+    Build the stub app. The number of sessions generated is kept on ``app["generated"]``,
+    injected failures on ``app["failed"]`` and the current fault settings on ``app["faults"]``.
+    """
+    app = web.Application()
+    app["generated"] = 0
+    app["failed"] = 0
+    app["faults"] = {"latency": latency, "error_rate": error_rate, "error_status": error_status}
+    counter = itertools.count(1)
+
+    async def generate(request: web.Request) -> web.Response:
+        faults = request.app["faults"]
+        if faults["latency"]:
+            await asyncio.sleep(faults["latency"])
+        if random.random() < faults["error_rate"]:
+            request.app["failed"] += 1
+            return web.json_response(
+                {"success": False, "error": "Injected failure"}, status=faults["error_status"]
+            )
+
+        if request.headers.get("api-key") != api_key:
+            return web.json_response({"success": False, "error": "Invalid API key"}, status=401)
+
+        request.app["generated"] += 1
+        session_id = f"{next(counter)}-{uuid.uuid4().hex[:8]}"
+        base = f"http://{request.host}"
+        return web.json_response(
+            {
+                "success": True,
+                "sessionId": session_id,
+                "uploadLink": f"{base}/upload/{session_id}",
+                "viewLink": f"{base}/view/{session_id}",
+            }
+        )
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(
+            {"generated": request.app["generated"], "failed": request.app["failed"], **request.app["faults"]}
+        )
+
+    async def faults(request: web.Request) -> web.Response:
+        changes = await request.json()
+        unknown = set(changes) - set(request.app["faults"])
+        if unknown:
+            return web.json_response({"error": f"Unknown fault settings: {sorted(unknown)}"}, status=400)
+        request.app["faults"].update(changes)
+        return web.json_response(request.app["faults"])
+
+    app.router.add_post(ENDPOINT, generate)
+    app.router.add_get("/stats", stats)
+    app.router.add_post("/faults", faults)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stub of the CDN log session endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--api-key", default="test")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to delay each generate call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of generate calls that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected failures")
+    args = parser.parse_args()
+    web.run_app(
+        make_app(args.api_key, args.latency, args.error_rate, args.error_status), host=args.host, port=args.port
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Local stand-in for the Wantuh migration API, for exercising the migrate plugin offline.
+
+Accepts both chunk formats the plugin can send: the JSON body and gzip/zstd-compressed
+NDJSON with the chunk metadata in ``X-Migrate-*`` headers. Point the plugin at it with::
+
+    python tools/fake_migrate_server.py --port 8080
+    MIGRATE_API_BASE=http://127.0.0.1:8080 <start the bot>
+
+aiohttp decodes ``Content-Encoding`` on the server side itself; zstd bodies need the
+``backports.zstd`` package (or Python 3.14+) alongside aiohttp.
+
+``--json-only`` makes the server reject compressed chunks with 415 so the plugin's
+fallback to JSON can be checked, and ``--fail-chunk`` injects a 500 for one chunk index.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from collections import defaultdict
+
+from aiohttp import web
+
+ENDPOINT = "/api/migrate/plugin"
+
+
+def make_app(json_only: bool = False, fail_chunk: int = -1) -> web.Application:
+    """Build the stand-in app. Per-collection state is kept on ``app["inserted"]``."""
+    app = web.Application(client_max_size=1024**3)
+    app["inserted"] = defaultdict(int)
+    app["chunks"] = defaultdict(set)
+    app["stats"] = {"requests": 0, "json": 0, "ndjson": 0, "wire_bytes": 0}
+
+    async def migrate(request: web.Request) -> web.Response:
+        stats = request.app["stats"]
+        stats["requests"] += 1
+        raw = await request.read()
+        stats["wire_bytes"] += request.content_length or len(raw)
+
+        if request.content_type == "application/x-ndjson":
+            if json_only:
+                return web.json_response({"error": "Compressed chunks not supported"}, status=415)
+            collection = request.headers["X-Migrate-Collection"]
+            chunk_index = int(request.headers["X-Migrate-Chunk-Index"])
+            documents = [json.loads(line) for line in raw.splitlines() if line]
+            stats["ndjson"] += 1
+        else:
+            payload = json.loads(raw)
+            collection = payload["collection"]
+            chunk_index = payload["chunkIndex"]
+            documents = payload["documents"]
+            stats["json"] += 1
+
+        if chunk_index == fail_chunk:
+            return web.json_response({"error": f"Injected failure on chunk {chunk_index}"}, status=500)
+
+        if chunk_index not in request.app["chunks"][collection]:
+            request.app["chunks"][collection].add(chunk_index)
+            request.app["inserted"][collection] += len(documents)
+        return web.json_response({"totalInserted": request.app["inserted"][collection]})
+
+    app.router.add_post(ENDPOINT, migrate)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stand-in for the migration API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--json-only", action="store_true", help="reject compressed NDJSON chunks")
+    parser.add_argument("--fail-chunk", type=int, default=-1, help="return 500 for this chunk index")
+    args = parser.parse_args()
+    web.run_app(make_app(args.json_only, args.fail_chunk), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+"""
+Stand-ins for the parts of Modmail and Discord the plugins touch, so they can be loaded
+and driven without a gateway connection, a Modmail checkout or a live MongoDB.
+
+``install_core_shim()`` registers a minimal ``core`` package (checks, models, thread,
+paginator) in ``sys.modules``; call it before importing a plugin module. ``FakeBot``
+exposes the attributes the plugins use: ``config``, ``api.db`` (mongomock-motor by
+default, or a real mongod), ``api.session``, ``threads`` and the colour/prefix helpers.
+Wrap the database in ``FakeWatchedDatabase`` to get change streams on the config
+collection, which mongomock-motor doesn't have.
+
+Discord objects (channels, threads, messages, members) only implement what the plugins
+call. Every REST-like coroutine sleeps for ``rest_latency`` seconds to simulate the API.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import enum
+import itertools
+import logging
+import sys
+import types
+from typing import Any, Dict, List, Optional
+
+import discord
+
+_ids = itertools.count(10**17)
+
+
+def install_core_shim() -> None:
+    """Register a ``core`` package with just enough of Modmail's API for the plugins."""
+    if "core" in sys.modules and getattr(sys.modules["core"], "__fake__", False):
+        return
+
+    core = types.ModuleType("core")
+    core.__fake__ = True
+    core.__path__ = []
+
+    checks = types.ModuleType("core.checks")
+
+    def has_permissions(level):
+        return lambda func: func
+
+    checks.has_permissions = has_permissions
+    checks.thread_only = lambda: (lambda func: func)
+
+    models = types.ModuleType("core.models")
+
+    class PermissionLevel(enum.IntEnum):
+        OWNER = 5
+        ADMINISTRATOR = 4
+        ADMIN = 4
+        MODERATOR = 3
+        MOD = 3
+        SUPPORTER = 2
+        RESPONDER = 2
+        REGULAR = 1
+        INVALID = -1
+
+    class DummyMessage:
+        def __init__(self, message):
+            self._message = message
+            self.content = getattr(message, "content", "")
+            self.author = getattr(message, "author", None)
+            self.attachments = []
+            self.embeds = []
+            self.components = []
+            self.stickers = []
+
+    models.PermissionLevel = PermissionLevel
+    models.getLogger = logging.getLogger
+    models.DummyMessage = DummyMessage
+
+    thread = types.ModuleType("core.thread")
+
+    class Thread:
+        @classmethod
+        async def from_channel(cls, manager, channel):
+            return next((t for t in manager.cache.values() if t.channel.id == channel.id), None)
+
+    thread.Thread = Thread
+
+    paginator = types.ModuleType("core.paginator")
+
+    class EmbedPaginatorSession:
+        def __init__(self, ctx, *embeds, **options):
+            self.ctx = ctx
+            self.embeds = embeds
+
+        async def run(self):
+            await self.ctx.send(embed=self.embeds[0])
+
+    paginator.EmbedPaginatorSession = EmbedPaginatorSession
+
+    for name, module in (("checks", checks), ("models", models), ("thread", thread), ("paginator", paginator)):
+        setattr(core, name, module)
+        sys.modules[f"core.{name}"] = module
+    sys.modules["core"] = core
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeChannel", content: Optional[str] = None, embed=None, author=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content or ""
+        self.embed = embed
+        self.author = author
+        self.reactions: List[str] = []
+
+    async def add_reaction(self, emoji: str) -> None:
+        await self.channel.rest()
+        self.reactions.append(emoji)
+
+    async def clear_reactions(self) -> None:
+        await self.channel.rest()
+        self.reactions.clear()
+
+    async def edit(self, content=None, embed=None) -> "FakeMessage":
+        await self.channel.rest()
+        self.content = content if content is not None else self.content
+        self.embed = embed or self.embed
+        return self
+
+    async def delete(self) -> None:
+        await self.channel.rest()
+
+    async def reply(self, content=None, embed=None, **kwargs) -> "FakeMessage":
+        return await self.channel.send(content, embed=embed, **kwargs)
+
+
+class FakeChannel:
+    def __init__(self, name: str, rest_latency: float = 0.0, category_id: Optional[int] = None):
+        self.id = next(_ids)
+        self.name = name
+        self.category_id = category_id
+        self.rest_latency = rest_latency
+        self.sent: List[FakeMessage] = []
+
+    @property
+    def mention(self) -> str:
+        return f"<#{self.id}>"
+
+    async def rest(self) -> None:
+        if self.rest_latency:
+            await asyncio.sleep(self.rest_latency)
+
+    async def send(self, content=None, embed=None, file=None, **kwargs) -> FakeMessage:
+        await self.rest()
+        message = FakeMessage(self, content, embed)
+        self.sent.append(message)
+        return message
+
+    async def edit(self, name: Optional[str] = None, **kwargs) -> "FakeChannel":
+        await self.rest()
+        if name is not None:
+            self.name = name
+        return self
+
+
+class FakeDiscordThread(FakeChannel):
+    """A ``discord.Thread`` as seen by ``on_thread_create``."""
+
+    def __init__(self, name: str, owner_id: Optional[int], rest_latency: float = 0.0):
+        super().__init__(name, rest_latency)
+        self.owner_id = owner_id
+        self.starter_message = None
+        self._first_author = types.SimpleNamespace(id=owner_id or next(_ids))
+
+    async def history(self, limit=None, oldest_first=False):
+        await self.rest()
+        yield types.SimpleNamespace(author=self._first_author)
+
+
+class FakeMember:
+    def __init__(self, name: str, role_ids=()):
+        self.id = next(_ids)
+        self.name = name
+        self.display_name = name
+        self.roles = [types.SimpleNamespace(id=role_id) for role_id in role_ids]
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class FakeGuild:
+    def __init__(self, members: List[FakeMember]):
+        self.id = next(_ids)
+        self.chunked = True
+        self._members = {member.id: member for member in members}
+
+    @property
+    def members(self) -> List[FakeMember]:
+        return list(self._members.values())
+
+    def get_member(self, member_id: int) -> Optional[FakeMember]:
+        return self._members.get(member_id)
+
+
+class FakeModmailThread:
+    """A Modmail thread: the recipient's id, its staff channel and ``reply``."""
+
+    def __init__(self, recipient: FakeMember, channel: FakeChannel):
+        self.id = recipient.id
+        self.recipient = recipient
+        self.channel = channel
+        self.dm = FakeChannel(f"dm-{recipient.name}", channel.rest_latency)
+
+    async def reply(self, message, anonymous=False, plain=False):
+        # Modmail sends to the recipient and mirrors into the staff channel
+        user_msg, staff_msg = await asyncio.gather(self.dm.send(message.content), self.channel.send(message.content))
+        return [staff_msg], [user_msg]
+
+
+class FakeThreadManager:
+    def __init__(self):
+        self.cache: Dict[int, FakeModmailThread] = {}
+
+    def open(self, recipient: FakeMember, rest_latency: float = 0.0) -> FakeModmailThread:
+        thread = FakeModmailThread(recipient, FakeChannel(recipient.name.lower(), rest_latency))
+        self.cache[recipient.id] = thread
+        return thread
+
+
+class FakeConfig:
+    """
+    Mirrors ``core.config.ConfigManager``: a raw value cache over defaults, with the
+    public/private key split the database uses.
+    """
+
+    public_keys: Dict[str, Any] = {
+        "prefix": "?",
+        "main_color": "#7289da",
+        "error_color": "#e74c3c",
+        "status": None,
+        "activity_type": None,
+        "activity_message": "",
+        "snippets": {},
+        "aliases": {},
+        "blocked": {},
+        **{f"option_{i}": "" for i in range(120)},
+    }
+    private_keys: Dict[str, Any] = {"plugins": [], "level_permissions": {}, "command_permissions": {}}
+    protected_keys: Dict[str, Any] = {"token": None, "connection_uri": None}
+    defaults = {**public_keys, **private_keys, **protected_keys}
+    all_keys = set(defaults)
+
+    def __init__(self, api: "FakeApi"):
+        self.api = api
+        self._cache: Dict[str, Any] = {"token": "fake"}
+        self.ready_event = asyncio.Event()
+
+    @classmethod
+    def filter_valid(cls, data: dict) -> dict:
+        return {
+            k.lower(): v for k, v in data.items() if k.lower() in cls.public_keys or k.lower() in cls.private_keys
+        }
+
+    async def refresh(self) -> dict:
+        for key, value in (await self.api.get_config()).items():
+            if key.lower() in self.all_keys:
+                self._cache[key.lower()] = value
+        self.ready_event.set()
+        return self._cache
+
+    async def wait_until_ready(self) -> None:
+        await self.ready_event.wait()
+
+    def __setitem__(self, key: str, item: Any) -> None:
+        self._cache[key.lower()] = item
+
+    def __getitem__(self, key: str) -> Any:
+        return self.get(key)
+
+    def get(self, key: str, *args, fallback=None, **kwargs) -> Any:
+        key = key.lower()
+        if key not in self.all_keys:
+            return fallback
+        if key not in self._cache:
+            self._cache[key] = copy.deepcopy(self.defaults[key])
+        return self._cache[key]
+
+    def remove(self, key: str) -> Any:
+        self._cache[key.lower()] = copy.deepcopy(self.defaults[key.lower()])
+        return self._cache[key.lower()]
+
+    def items(self):
+        return self._cache.items()
+
+
+class FakeChangeStream:
+    """An open ``watch()`` cursor: yields one change event per write to the collection."""
+
+    def __init__(self, collection: "FakeWatchedCollection"):
+        self.collection = collection
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.resume_token = None
+
+    async def __aenter__(self) -> "FakeChangeStream":
+        self.collection.streams.append(self)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.collection.streams.remove(self)
+
+    def __aiter__(self) -> "FakeChangeStream":
+        return self
+
+    async def __anext__(self) -> dict:
+        event = await self.events.get()
+        self.resume_token = event["_id"]
+        return event
+
+
+class FakeWatchedCollection:
+    """
+    A collection with the ``watch()`` that mongomock-motor lacks. Only writes made through
+    ``update_one`` produce change events; everything else goes to the wrapped collection.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.streams: List[FakeChangeStream] = []
+        self._tokens = itertools.count()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.collection, name)
+
+    def watch(self, pipeline=None, resume_after=None) -> FakeChangeStream:
+        return FakeChangeStream(self)
+
+    async def update_one(self, filter: dict, update: dict, **kwargs):
+        result = await self.collection.update_one(filter, update, **kwargs)
+        document = await self.collection.find_one(filter, {"_id": 1})
+        if document is not None:
+            event = {"_id": {"_data": next(self._tokens)}, "operationType": "update", "documentKey": document}
+            for stream in self.streams:
+                stream.events.put_nowait(event)
+        return result
+
+
+class FakeWatchedDatabase:
+    """Passes through to a motor database, with ``config`` replaced by a :class:`FakeWatchedCollection`."""
+
+    def __init__(self, db):
+        self.db = db
+        self.config = FakeWatchedCollection(db.config)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.db, name)
+
+    def __getitem__(self, name: str):
+        return self.config if name == "config" else self.db[name]
+
+
+class FakeApi:
+    def __init__(self, db, session, bot: "FakeBot"):
+        self.db = db
+        self.session = session
+        self.bot = bot
+
+    async def get_config(self) -> dict:
+        conf = await self.db.config.find_one({"bot_id": self.bot.user.id})
+        if conf is None:
+            await self.db.config.insert_one({"bot_id": self.bot.user.id})
+            conf = await self.db.config.find_one({"bot_id": self.bot.user.id})
+        return conf
+
+    def get_plugin_partition(self, cog):
+        return self.db[f"plugins.{cog.__class__.__name__}"]
+
+
+class FakeBot:
+    """The attributes of ``bot.ModmailBot`` the plugins in this repository use."""
+
+    def __init__(self, db, session, rest_latency: float = 0.0):
+        self.user = types.SimpleNamespace(
+            id=next(_ids), display_avatar=types.SimpleNamespace(url="https://cdn.discordapp.com/embed/avatars/0.png")
+        )
+        self.api = FakeApi(db, session, self)
+        self.config = FakeConfig(self.api)
+        self.threads = FakeThreadManager()
+        self.rest_latency = rest_latency
+        self.latency = 0.05
+        self.uptime = "0s"
+        self.version = "4.1.0"
+        self.guilds: Dict[int, FakeGuild] = {}
+        self.cogs: Dict[str, Any] = {}
+
+    @property
+    def prefix(self) -> str:
+        return self.config.get("prefix")
+
+    @property
+    def main_color(self) -> int:
+        return discord.Color.blurple().value
+
+    @property
+    def error_color(self) -> int:
+        return discord.Color.red().value
+
+    async def wait_until_ready(self) -> None:
+        pass
+
+    def get_guild(self, guild_id: int) -> Optional[FakeGuild]:
+        return self.guilds.get(guild_id)
+
+    def get_cog(self, name: str):
+        return self.cogs.get(name)
+
+    async def add_cog(self, cog) -> None:
+        await cog.cog_load()
+        self.cogs[cog.qualified_name] = cog
+
+    async def remove_cog(self, name: str) -> None:
+        cog = self.cogs.pop(name, None)
+        if cog is not None:
+            await cog.cog_unload()
+
+    def remove_command(self, name: str):
+        return object()
+
+    def context(self, channel: FakeChannel, author: FakeMember, thread=None) -> "FakeContext":
+        return FakeContext(self, channel, author, thread)
+
+
+class FakeContext:
+    def __init__(self, bot: FakeBot, channel: FakeChannel, author: FakeMember, thread=None):
+        self.bot = bot
+        self.channel = channel
+        self.author = author
+        self.thread = thread
+        self.message = FakeMessage(channel, author=author)
+        self.author.display_avatar = types.SimpleNamespace(url="https://cdn.discordapp.com/embed/avatars/1.png")
+
+    async def send(self, content=None, embed=None, **kwargs) -> FakeMessage:
+        return await self.channel.send(content, embed=embed, **kwargs)
+
+    async def reply(self, content=None, embed=None, **kwargs) -> FakeMessage:
+        return await self.channel.send(content, embed=embed, **kwargs)
+
+    async def send_help(self, *args) -> None:
+        pass
@@ -0,0 +1,391 @@
+"""
+Offline load test for the plugins in this repository, driven through the fake Modmail
+bot in ``fakebot.py``. Nothing here talks to Discord: REST calls are simulated with a
+fixed latency, MongoDB is mongomock-motor (or a real mongod with ``--mongo-uri``) and the
+CDN and migration APIs are the local stubs in this directory, started in-process.
+
+Each scenario runs ``--ops`` operations with at most ``--concurrency`` in flight::
+
+    python tools/loadtest.py                              # every scenario
+    python tools/loadtest.py createsession rename --ops 1000 --concurrency 50
+    python tools/loadtest.py dbmigrate --docs 20000 --mongo-uri mongodb://localhost:27017
+
+Scenarios:
+
+``dbmigrate``       one full ``dbmigrate`` of ``--docs`` thread logs per op, against
+                    ``fake_migrate_server.py``
+``thread_create``   CheckRole's ``on_thread_create``; every tenth thread has no owner id
+                    and takes the history fallback
+``createsession``   LogSession's ``createsession`` in separate tickets, against
+                    ``fake_cdn_server.py`` (``--cdn-latency``, ``--session-pool``)
+``rename``          Rename's ``rename`` in separate threads (within the rename budget);
+                    paced by the plugin's global interval unless ``--rename-interval``
+``configrefresh``   an external config edit followed by a diff ``configrefresh``
+``configsync_stream`` a burst of three external config edits picked up by ConfigRefresh's
+                    background sync through a change stream (``FakeWatchedDatabase`` unless
+                    ``--mongo-uri``); the note shows how many syncs the bursts debounced to
+``configsync_poll`` the same bursts with the stock collection, where mongomock-motor's
+                    missing change streams make the sync fall back to polling
+
+Reported per scenario: wall time, throughput, p50/p95/p99/max latency of one op and peak
+RSS. Each scenario runs in its own interpreter so the RSS column belongs to it alone;
+``--in-process`` runs them all in this one instead, and the column becomes the cumulative
+peak so far. ``--tracemalloc`` adds the peak of traced Python allocations during the
+scenario, at a noticeable cost in throughput.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Read by the plugins at import time
+os.environ.setdefault("CDN_API_KEY", "test")
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+from fakebot import (  # noqa: E402
+    FakeBot,
+    FakeDiscordThread,
+    FakeGuild,
+    FakeMember,
+    FakeWatchedDatabase,
+    install_core_shim,
+)
+
+install_core_shim()
+
+from bench_serializer import make_log  # noqa: E402
+from fake_cdn_server import make_app as make_cdn_app  # noqa: E402
+from fake_migrate_server import make_app as make_migrate_app  # noqa: E402
+
+DB_NAME = "modmail_loadtest"
+SCENARIOS = (
+    "dbmigrate",
+    "thread_create",
+    "createsession",
+    "rename",
+    "configrefresh",
+    "configsync_stream",
+    "configsync_poll",
+)
+# ConfigRefresh's sync timings, shortened so a burst settles in a fraction of a second
+SYNC_DEBOUNCE = 0.05
+SYNC_MAX_DELAY = 0.5
+SYNC_POLL_INTERVAL = 0.1
+
+
+def _client(mongo_uri):
+    if mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        return AsyncIOMotorClient(mongo_uri)
+    from mongomock_motor import AsyncMongoMockClient
+
+    return AsyncMongoMockClient()
+
+
+async def _start(app: web.Application) -> tuple:
+    """Serve ``app`` on a free local port; returns the runner and the base URL."""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def drive(op, ops: int, concurrency: int) -> tuple:
+    """Run ``op(i)`` for every i with bounded concurrency; returns latencies and wall time."""
+    latencies = []
+    index = iter(range(ops))
+
+    async def worker():
+        for i in index:
+            started = time.perf_counter()
+            await op(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, ops))))
+    return latencies, time.perf_counter() - started
+
+
+async def scenario_dbmigrate(bot: FakeBot, args) -> tuple:
+    import migrate.migrate as migrate
+
+    rng = random.Random(args.seed)
+    await bot.api.db.logs.drop()
+    for start in range(0, args.docs, 1000):
+        await bot.api.db.logs.insert_many([make_log(rng, 20) for _ in range(min(1000, args.docs - start))])
+
+    app = make_migrate_app()
+    runner, base = await _start(app)
+    migrate.MIGRATE_ENDPOINT = base + "/api/migrate/plugin"
+    migrate.PROGRESS_INTERVAL = 0.5
+    cog = migrate.Migrate(bot)
+    guild_channel = bot.threads.open(FakeMember("admin"), args.rest_latency).channel
+    try:
+        # Each op is a complete migration, so they run one at a time
+        latencies, wall = await drive(
+            lambda i: cog.migrate.callback(cog, bot.context(guild_channel, FakeMember("admin")), f"token-{i}"),
+            args.ops_dbmigrate,
+            1,
+        )
+    finally:
+        await runner.cleanup()
+    docs = args.docs * args.ops_dbmigrate
+    return latencies, wall, f"{docs / wall:,.0f} docs/s"
+
+
+async def scenario_thread_create(bot: FakeBot, args) -> tuple:
+    import checkrole.checkrole as checkrole
+
+    role_ids = [random.getrandbits(60) for _ in range(10)]
+    await bot.api.db.roles.drop()
+    await bot.api.db.roles.insert_many([{"role_id": r, "role_name": f"role-{r % 1000}"} for r in role_ids])
+    members = [FakeMember(f"user{i}", random.sample(role_ids, 5)) for i in range(args.ops)]
+    guild = FakeGuild(members)
+    bot.guilds[guild.id] = guild
+
+    cog = checkrole.CheckRole(bot)
+    cog.guild_id = guild.id
+    await bot.add_cog(cog)
+    threads = [
+        FakeDiscordThread(f"ticket-{i}", None if i % 10 == 0 else member.id, args.rest_latency)
+        for i, member in enumerate(members)
+    ]
+    # The history fallback needs to find the member too
+    for thread, member in zip(threads, members):
+        thread._first_author.id = member.id
+    try:
+        latencies, wall = await drive(lambda i: cog.on_thread_create(threads[i]), args.ops, args.concurrency)
+    finally:
+        await bot.remove_cog(cog.qualified_name)
+    return latencies, wall, f"{sum(len(t.sent) for t in threads)} role checks posted"
+
+
+async def scenario_createsession(bot: FakeBot, args) -> tuple:
+    import sessioncreate.sessioncreate as sessioncreate
+
+    app = make_cdn_app("test", latency=args.cdn_latency)
+    runner, base = await _start(app)
+    sessioncreate.GENERATE_ENDPOINT = base + "/api/logs/generate"
+    sessioncreate.SESSION_POOL_SIZE = args.session_pool
+
+    cog = sessioncreate.LogSession(bot)
+    await bot.add_cog(cog)
+    staff = FakeMember("staff")
+    tickets = [bot.threads.open(FakeMember(f"user{i}"), args.rest_latency) for i in range(args.ops)]
+    # Let the warm pool fill before measuring
+    deadline = time.monotonic() + 10
+    while len(cog.session_pool) < args.session_pool and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    try:
+        latencies, wall = await drive(
+            lambda i: cog.create_session_command.callback(cog, bot.context(tickets[i].channel, staff, tickets[i])),
+            args.ops,
+            args.concurrency,
+        )
+    finally:
+        await bot.remove_cog(cog.qualified_name)
+        await runner.cleanup()
+    return latencies, wall, f"{app['generated']} CDN sessions generated"
+
+
+async def scenario_rename(bot: FakeBot, args) -> tuple:
+    import rename.rename as rename
+
+    if args.rename_interval is not None:
+        rename.GLOBAL_RENAME_INTERVAL = args.rename_interval
+    cog = rename.Rename(bot)
+    await bot.add_cog(cog)
+    staff = FakeMember("handler")
+    tickets = [bot.threads.open(FakeMember(f"user{i}"), args.rest_latency) for i in range(args.ops)]
+    try:
+        latencies, wall = await drive(
+            lambda i: cog.rename.callback(cog, bot.context(tickets[i].channel, staff, tickets[i])),
+            args.ops,
+            args.concurrency,
+        )
+    finally:
+        await bot.remove_cog(cog.qualified_name)
+    renamed = sum(t.channel.name.startswith("handler-") for t in tickets)
+    return latencies, wall, f"{renamed} channels renamed"
+
+
+async def scenario_configrefresh(bot: FakeBot, args) -> tuple:
+    import configrefresh.configrefresh as configrefresh
+
+    # Measure the manual refresh on its own, without the background sync reacting to the edits
+    await bot.api.db["plugins.ConfigRefresh"].update_one({"_id": "sync"}, {"$set": {"enabled": False}}, upsert=True)
+    config_id = (await bot.api.get_config())["_id"]
+    await bot.config.refresh()
+
+    cog = configrefresh.ConfigRefresh(bot)
+    await bot.add_cog(cog)
+    admin = FakeMember("admin")
+    channel = bot.threads.open(admin, args.rest_latency).channel
+    keys = [key for key in bot.config.public_keys if key.startswith("option_")]
+
+    async def op(i):
+        await bot.api.db.config.update_one({"_id": config_id}, {"$set": {random.choice(keys): f"value-{i}"}})
+        await cog.config_refresh.callback(cog, bot.context(channel, admin))
+
+    try:
+        latencies, wall = await drive(op, args.ops, args.concurrency)
+    finally:
+        await bot.remove_cog(cog.qualified_name)
+    return latencies, wall, ""
+
+
+async def _configsync(bot: FakeBot, args, watched: bool) -> tuple:
+    import configrefresh.configrefresh as configrefresh
+
+    configrefresh.SYNC_DEBOUNCE = SYNC_DEBOUNCE
+    configrefresh.SYNC_MAX_DELAY = SYNC_MAX_DELAY
+    configrefresh.SYNC_POLL_INTERVAL = SYNC_POLL_INTERVAL
+    configrefresh.SYNC_RETRY_DELAY = SYNC_POLL_INTERVAL
+    if watched and not args.mongo_uri:
+        bot.api.db = FakeWatchedDatabase(bot.api.db)
+    config_id = (await bot.api.get_config())["_id"]
+    await bot.config.refresh()
+
+    cog = configrefresh.ConfigRefresh(bot)
+    await bot.add_cog(cog)
+    while cog.sync_mode in ("off", "starting"):
+        await asyncio.sleep(0.01)
+    # Let the poller take its first snapshot, or the first burst would be the baseline
+    await asyncio.sleep(SYNC_POLL_INTERVAL * 2)
+    keys = [key for key in bot.config.public_keys if key.startswith("option_")]
+
+    async def op(i):
+        key = random.choice(keys)
+        for j in range(3):
+            await bot.api.db.config.update_one({"_id": config_id}, {"$set": {key: f"value-{i}-{j}"}})
+            await asyncio.sleep(SYNC_DEBOUNCE / 2)
+        while bot.config[key] != f"value-{i}-2":
+            await asyncio.sleep(0.005)
+
+    try:
+        # One config document, so bursts can't overlap without merging into one sync
+        latencies, wall = await drive(op, args.ops_configsync, 1)
+        mode = cog.sync_mode
+    finally:
+        await bot.remove_cog(cog.qualified_name)
+    return latencies, wall, f"{cog.syncs_applied} syncs for {len(latencies)} bursts ({mode})"
+
+
+async def scenario_configsync_stream(bot: FakeBot, args) -> tuple:
+    return await _configsync(bot, args, watched=True)
+
+
+async def scenario_configsync_poll(bot: FakeBot, args) -> tuple:
+    return await _configsync(bot, args, watched=False)
+
+
+def _percentile(values: list, pct: float) -> float:
+    return values[max(math.ceil(pct / 100 * len(values)) - 1, 0)]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load test for the plugins.")
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS), help=f"any of {', '.join(SCENARIOS)}")
+    parser.add_argument("--ops", type=int, default=500, help="operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=20, help="operations in flight at once")
+    parser.add_argument("--rest-latency", type=float, default=0.02, help="simulated Discord REST latency in seconds")
+    parser.add_argument("--mongo-uri", help="use this mongod instead of mongomock-motor")
+    parser.add_argument("--docs", type=int, default=5000, help="thread logs migrated by dbmigrate")
+    parser.add_argument("--ops-dbmigrate", type=int, default=3, help="full migrations to run")
+    parser.add_argument("--ops-configsync", type=int, default=20, help="edit bursts per configsync scenario")
+    parser.add_argument("--cdn-latency", type=float, default=0.05, help="latency of the fake CDN in seconds")
+    parser.add_argument("--session-pool", type=int, default=0, help="LogSession warm pool size")
+    parser.add_argument("--rename-interval", type=float, help="override the Rename plugin's global pace")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report traced allocation peaks")
+    parser.add_argument("--in-process", action="store_true", help="run every scenario in this process")
+    parser.add_argument("--rows-only", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    random.seed(args.seed)
+
+    cumulative = args.in_process and len(args.scenarios) > 1
+    rss_label = "cum RSS MiB" if cumulative else "RSS MiB"
+    header = (
+        f"{'scenario':<19}{'ops':>6}{'wall s':>9}{'ops/s':>10}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'p99 ms':>9}{'max ms':>9}{rss_label:>12}"
+    )
+    if args.tracemalloc:
+        header += f"{'traced MiB':>12}"
+
+    if len(args.scenarios) > 1 and not args.in_process:
+        # One interpreter per scenario, so ru_maxrss isn't carried over from the previous one
+        options = [arg for arg in sys.argv[1:] if arg not in SCENARIOS]
+        lines = []
+        for name in args.scenarios:
+            result = await asyncio.to_thread(
+                subprocess.run,
+                [sys.executable, __file__, name, *options, "--rows-only"],
+                stdout=subprocess.PIPE,
+                text=True,
+                check=True,
+            )
+            lines.extend(result.stdout.splitlines())
+        print(header)
+        for line in lines:
+            print(line)
+        return
+
+    client = _client(args.mongo_uri)
+    rows = []
+
+    async with aiohttp.ClientSession() as session:
+        for name in args.scenarios:
+            await client.drop_database(DB_NAME)
+            bot = FakeBot(client[DB_NAME], session, args.rest_latency)
+            if args.tracemalloc:
+                tracemalloc.start()
+            latencies, wall, note = await globals()[f"scenario_{name}"](bot, args)
+            traced = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+            if args.tracemalloc:
+                tracemalloc.stop()
+
+            values = sorted(ms * 1000 for ms in latencies)
+            # ru_maxrss is in KiB on Linux.
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            row = (
+                f"{name:<19}{len(values):>6}{wall:>9.2f}{len(values) / wall:>10.1f}"
+                f"{_percentile(values, 50):>9.1f}{_percentile(values, 95):>9.1f}"
+                f"{_percentile(values, 99):>9.1f}{values[-1]:>9.1f}{rss:>12.1f}"
+            )
+            if traced is not None:
+                row += f"{traced / 1024 / 1024:>12.1f}"
+            rows.append((row, note))
+            print(f"{name}: done {note}", file=sys.stderr)
+
+    if args.mongo_uri:
+        await client.drop_database(DB_NAME)
+
+    if not args.rows_only:
+        print(header)
+    for row, note in rows:
+        print(row + (f"  {note}" if note else ""))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())